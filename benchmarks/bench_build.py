@@ -0,0 +1,147 @@
+"""
+Build benchmark suite: generates a synthetic library per size (see
+synthetic_library.py) and times
+
+  * a full build from an empty database (update_database + generate_kicad_dbl),
+  * a no-op rebuild with nothing changed,
+  * an incremental build after editing 1% of the resistors,
+  * the queries KiCad and search_library.py run against the result.
+
+The full build's per-phase totals come from the builder's own profile.
+Results are printed as a table and can be written as JSON for tracking
+over time.
+
+Usage: python benchmarks/bench_build.py [--json FILE] [--repeat N] [parts ...]   (default: 10000 100000)
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_bulk_load import builder, point_builder_at
+from synthetic_library import edit_rows, generate_library
+
+QUERY_REPEATS = 200
+EDIT_FRACTION = 0.01
+
+def time_build():
+    """Runs both build phases quietly; returns the elapsed seconds"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        tables = builder.update_database()
+        if tables:
+            builder.generate_kicad_dbl(tables)
+    elapsed = time.perf_counter() - start
+    if builder.build_errors:
+        raise RuntimeError(f"build failed: {builder.build_errors}")
+    return elapsed
+
+def median_us(conn, sql, params_list):
+    """Median wall time in microseconds of running sql once per params"""
+    timings = []
+    for params in params_list:
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return round(statistics.median(timings), 1)
+
+def time_queries(counts):
+    """Times the typical lookups on the built database; returns {query name: median us}"""
+    rng = random.Random(0)
+    resistors = counts['resistors.csv']
+    conn = sqlite3.connect(builder.db_file)
+    # KiCad resolves placed parts by key and lists a category in the chooser
+    mpns = [row[0] for row in conn.execute("SELECT mpn FROM capacitors ORDER BY random() LIMIT ?", (QUERY_REPEATS,))]
+    results = {
+        'part_id_lookup': median_us(conn, "SELECT * FROM resistors WHERE part_id = ?",
+                                    [(f"RES-{rng.randrange(resistors) + 1:07d}",) for _ in range(QUERY_REPEATS)]),
+        'mpn_lookup': median_us(conn, "SELECT * FROM capacitors WHERE mpn = ?", [(m,) for m in mpns]),
+        'value_range': median_us(conn, "SELECT COUNT(*) FROM resistors WHERE value_si BETWEEN ? AND ? AND package = ?",
+                                 [(1e3, 1e4, '603')] * 20),
+        'list_category': median_us(conn, "SELECT * FROM ics", [()] * 3),
+    }
+    conn.close()
+    if builder.SEARCH_TABLE is not None and builder.fts5_available():
+        timings = []
+        for query in ['4.7k 0603', '100n X7R', 'STM32 QFN', 'inductor 2u2'] * 5:
+            start = time.perf_counter()
+            builder.search_parts(query)
+            timings.append((time.perf_counter() - start) * 1e6)
+        results['search'] = round(statistics.median(timings), 1)
+    return results
+
+def run_size(parts, repeat):
+    """Generates a library of `parts` parts and benchmarks it; returns the result dict"""
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        counts = generate_library(folder, parts)
+        generate_seconds = time.perf_counter() - start
+        point_builder_at(folder)
+
+        full = []
+        for _ in range(repeat):
+            for path in (builder.db_file, builder.dbl_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            full.append(time_build())
+        phases = {p['phase']: round(p['seconds'], 4) for p in builder.profile_totals()}
+        db_bytes = os.path.getsize(builder.db_file)
+
+        noop = min(time_build() for _ in range(repeat))
+
+        incremental = []
+        for n in range(repeat):
+            edited = edit_rows(os.path.join(builder.csv_folder, 'resistors.csv'), EDIT_FRACTION, seed=n + 1)
+            incremental.append(time_build())
+
+        return {
+            'parts': parts,
+            'tables': counts,
+            'generate_seconds': round(generate_seconds, 3),
+            'full_build_seconds': round(min(full), 4),
+            'full_build_rows_per_second': round(parts / min(full), 1),
+            'noop_build_seconds': round(noop, 4),
+            'incremental_build_seconds': round(min(incremental), 4),
+            'incremental_rows_edited': edited,
+            'database_bytes': db_bytes,
+            'full_build_phases': phases,
+            'query_median_us': time_queries(counts),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Times full, no-op and incremental builds of synthetic libraries.")
+    parser.add_argument('parts', type=int, nargs='*', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=1, help="runs per build; the fastest is reported")
+    parser.add_argument('--json', metavar='FILE', help="also write the results to FILE")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'parts':>9} {'full':>9} {'rows/s':>10} {'no-op':>8} {'1% edit':>9} {'db size':>9} "
+          f"{'part_id':>9} {'mpn':>8} {'range':>8} {'search':>8}")
+    for parts in args.parts:
+        result = run_size(parts, args.repeat)
+        results.append(result)
+        queries = result['query_median_us']
+        print(f"{parts:>9} {result['full_build_seconds']:>8.2f}s {result['full_build_rows_per_second']:>10,.0f} "
+              f"{result['noop_build_seconds']:>7.3f}s {result['incremental_build_seconds']:>8.2f}s "
+              f"{result['database_bytes'] / 1e6:>7.1f}MB {queries['part_id_lookup']:>7.1f}us "
+              f"{queries['mpn_lookup']:>6.1f}us {queries['value_range']:>6.0f}us {queries.get('search', 0):>6.0f}us")
+
+    if args.json:
+        report = {key: value for key, value in builder.profile_report().items()
+                  if key in ('created', 'python', 'sqlite', 'platform')}
+        report['results'] = results
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
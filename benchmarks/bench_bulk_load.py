@@ -0,0 +1,68 @@
+"""
+Compares the per-table-commit load path of build_kicad_library.py with the
+single-transaction bulk-load mode on synthetic category CSVs.
+
+The rows are split across CATEGORIES files so the per-table commits show up.
+
+Usage: python benchmarks/bench_bulk_load.py [rows ...]   (default: 100000 1000000)
+"""
+import contextlib
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import build_kicad_library as builder
+
+HEADERS = ['part_id', 'value', 'symbol', 'footprint', 'description', 'mfg', 'mpn', 'rating', 'package']
+PACKAGES = ['0402', '0603', '0805', '1206']
+CATEGORIES = 8
+VALUES = ['10', '22', '47', '100', '220', '470', '1k', '2k2', '4k7', '10k', '22k', '47k', '100k']
+
+def write_synthetic_csv(path, rows, offset=0):
+    """Writes a resistor-like category CSV with the given number of rows"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        for i in range(offset, offset + rows):
+            value = VALUES[i % len(VALUES)]
+            package = PACKAGES[(i // len(VALUES)) % len(PACKAGES)]
+            writer.writerow([
+                f"SYN-{i:07d}", value, 'INO_Symbols:R', f"INO_Footprints:R_{package}",
+                f"{value}Ω ±1% {package} Thick Film Resistor", 'YAGEO', f"RC{package}FR-07{value}L{i}",
+                '1%', package
+            ])
+
+def point_builder_at(folder):
+    """Redirects the builder's module-level paths into a scratch folder"""
+    builder.configure_paths(root=folder)
+
+def time_build(folder, bulk_load):
+    """Runs one full build from an empty database and returns the elapsed seconds"""
+    if os.path.exists(builder.db_file):
+        os.remove(builder.db_file)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        builder.update_database(bulk_load=bulk_load)
+    return time.perf_counter() - start
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    print(f"{'rows':>10} {'per-table commit':>18} {'bulk load':>12} {'speedup':>9}")
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            os.makedirs(os.path.join(folder, 'Database'))
+            per_category = rows // CATEGORIES
+            for n in range(CATEGORIES):
+                write_synthetic_csv(os.path.join(folder, 'Database', f"synthetic_{n}.csv"),
+                                    per_category, offset=n * per_category)
+            point_builder_at(folder)
+            default_time = time_build(folder, bulk_load=False)
+            bulk_time = time_build(folder, bulk_load=True)
+        print(f"{rows:>10} {default_time:>17.2f}s {bulk_time:>11.2f}s {default_time / bulk_time:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
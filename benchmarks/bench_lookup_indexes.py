@@ -0,0 +1,61 @@
+"""
+Compares full-scan and indexed lookup latency (COUNT(*) of the matching rows,
+so result transfer does not hide the lookup) on the columns covered by
+INDEX_COLUMNS, on a synthetic category table built by build_kicad_library.py.
+
+Usage: python benchmarks/bench_lookup_indexes.py [rows ...]   (default: 10000 100000 1000000)
+"""
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_bulk_load import builder, point_builder_at, write_synthetic_csv
+
+QUERIES_PER_COLUMN = 50
+
+def median_latency(cursor, sql, params_list):
+    """Returns the median wall time in microseconds of running sql once per params"""
+    timings = []
+    for params in params_list:
+        start = time.perf_counter()
+        cursor.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(timings)
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    print(f"{'rows':>10} {'column':>10} {'scan':>12} {'indexed':>12} {'speedup':>9}")
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            os.makedirs(os.path.join(folder, 'Database'))
+            write_synthetic_csv(os.path.join(folder, 'Database', 'synthetic.csv'), rows)
+            point_builder_at(folder)
+            with contextlib.redirect_stdout(io.StringIO()):
+                builder.update_database()
+
+            conn = sqlite3.connect(builder.db_file)
+            cursor = conn.cursor()
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(synthetic)")]
+            for col in columns:
+                if not builder.wanted_indexes('synthetic', [col]):
+                    continue
+                # `col = NULL` matches nothing, so NULLs would time an empty lookup
+                sample = [row for row in cursor.execute(
+                    f"SELECT {col} FROM synthetic WHERE {col} IS NOT NULL ORDER BY random() LIMIT {QUERIES_PER_COLUMN}")]
+                if not sample:
+                    continue
+                random.shuffle(sample)
+                scan = median_latency(cursor, f"SELECT COUNT(*) FROM synthetic NOT INDEXED WHERE {col} = ?", sample)
+                indexed = median_latency(cursor, f"SELECT COUNT(*) FROM synthetic WHERE {col} = ?", sample)
+                print(f"{rows:>10} {col:>10} {scan:>10.0f}us {indexed:>10.0f}us {scan / indexed:>8.1f}x")
+            conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares the 'rowid' and 'without_rowid' TABLE_LAYOUT options of
+build_kicad_library.py: database file size and the latency of the
+point lookups KiCad's ODBC source issues (SELECT * ... WHERE part_id = ?).
+
+Lookup indexes and the search index are switched off so the file size
+reflects the category table alone.
+
+Usage: python benchmarks/bench_table_layout.py [rows ...]   (default: 100000 1000000)
+"""
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_bulk_load import builder, point_builder_at, write_synthetic_csv
+
+LOOKUPS = 2000
+
+def measure(folder, rows, table_layout):
+    """Builds the synthetic table with one layout; returns (file size in bytes, median lookup in us)"""
+    if os.path.exists(builder.db_file):
+        os.remove(builder.db_file)
+    with contextlib.redirect_stdout(io.StringIO()):
+        builder.update_database(table_layout=table_layout)
+    size = os.path.getsize(builder.db_file)
+
+    keys = [(f"SYN-{random.randrange(rows):07d}",) for _ in range(LOOKUPS)]
+    conn = sqlite3.connect(builder.db_file)
+    timings = []
+    for params in keys:
+        start = time.perf_counter()
+        conn.execute("SELECT * FROM synthetic WHERE part_id = ?", params).fetchall()
+        timings.append((time.perf_counter() - start) * 1e6)
+    conn.close()
+    return size, statistics.median(timings)
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    builder.INDEX_COLUMNS = []
+    builder.SEARCH_TABLE = None
+    print(f"{'rows':>10} {'layout':>14} {'file size':>12} {'lookup':>10}")
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            os.makedirs(os.path.join(folder, 'Database'))
+            write_synthetic_csv(os.path.join(folder, 'Database', 'synthetic.csv'), rows)
+            point_builder_at(folder)
+            for table_layout in ('rowid', 'without_rowid'):
+                size, latency = measure(folder, rows, table_layout)
+                print(f"{rows:>10} {table_layout:>14} {size / 1e6:>10.1f}MB {latency:>8.1f}us")
+
+if __name__ == "__main__":
+    main()
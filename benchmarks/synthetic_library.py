@@ -0,0 +1,173 @@
+"""
+Generates a synthetic INO library (a Database/ folder of category CSVs) of
+any size, shaped like the real one: E24 resistors and E12 capacitors across
+the usual chip packages, a few inductors, and a wide IC table with many
+parameter columns.
+
+The output is deterministic for a given part count and seed, so builds of
+the same size can be compared between runs.
+
+Usage: python benchmarks/synthetic_library.py FOLDER [parts]   (default: 100000)
+"""
+import csv
+import os
+import random
+import sys
+
+E24 = [1.0, 1.1, 1.2, 1.3, 1.5, 1.6, 1.8, 2.0, 2.2, 2.4, 2.7, 3.0,
+       3.3, 3.6, 3.9, 4.3, 4.7, 5.1, 5.6, 6.2, 6.8, 7.5, 8.2, 9.1]
+E12 = [1.0, 1.2, 1.5, 1.8, 2.2, 2.7, 3.3, 3.9, 4.7, 5.6, 6.8, 8.2]
+
+# (package, metric footprint suffix, power rating, voltage rating)
+RESISTOR_PACKAGES = [('0201', '0603Metric', '50mW', '25V'), ('0402', '1005Metric', '62.5mW', '50V'),
+                     ('0603', '1608Metric', '100mW', '75V'), ('0805', '2012Metric', '125mW', '150V'),
+                     ('1206', '3216Metric', '250mW', '200V'), ('2512', '6332Metric', '1W', '200V')]
+CAPACITOR_PACKAGES = [('0402', '1005Metric'), ('0603', '1608Metric'), ('0805', '2012Metric'),
+                      ('1206', '3216Metric'), ('1210', '3225Metric')]
+RESISTOR_MFGS = [('YAGEO', 'RC{package}FR-07{value}L'), ('UNI-ROYAL', '{package}WAF{value}T5E'),
+                 ('Vishay', 'CRCW{package}{value}FKEA')]
+CAPACITOR_MFGS = [('muRata', 'GRM{package}{dielectric}{voltage}{value}'), ('Samsung', 'CL{package}{dielectric}{value}{voltage}'),
+                  ('YAGEO', 'CC{package}KR{dielectric}{voltage}BB{value}')]
+DIELECTRICS = [('C0G', 1e-12, 10e-9), ('X7R', 100e-12, 1e-6), ('X5R', 100e-9, 100e-6)]
+CAPACITOR_VOLTAGES = ['6.3V', '10V', '16V', '25V', '50V']
+
+IC_FAMILIES = ['STM32G0', 'STM32F4', 'RP2040', 'ESP32-S3', 'ATSAMD21', 'nRF52840', 'TPS6', 'LM317', 'AMS1117', 'CH340']
+IC_PACKAGES = [('QFN-48', 'Package_DFN_QFN:QFN-48-1EP_7x7mm_P0.5mm_EP5.6x5.6mm'),
+               ('LQFP-64', 'Package_QFP:LQFP-64_10x10mm_P0.5mm'),
+               ('SOT-23-5', 'Package_TO_SOT_SMD:SOT-23-5'),
+               ('SOIC-8', 'Package_SO:SOIC-8_3.9x4.9mm_P1.27mm'),
+               ('TSSOP-20', 'Package_SO:TSSOP-20_4.4x6.5mm_P0.65mm')]
+IC_PARAMETERS = ['core', 'max_frequency', 'flash', 'ram', 'eeprom', 'io_count', 'supply_min', 'supply_max',
+                 'temp_min', 'temp_max', 'adc_channels', 'adc_bits', 'dac_channels', 'uart', 'spi', 'i2c',
+                 'usb', 'can', 'timers', 'pwm_channels', 'dma_channels', 'rtc', 'watchdog', 'crypto',
+                 'radio', 'quiescent_current', 'output_current', 'dropout', 'efficiency', 'switching_frequency',
+                 'datasheet', 'lifecycle', 'rohs', 'reach', 'moisture_level', 'package_height',
+                 'pin_pitch', 'grade', 'packaging', 'stock']
+
+# Share of the parts per category
+MIX = [('resistors', 0.45), ('capacitors', 0.35), ('inductors', 0.05), ('ics', 0.15)]
+
+def rkm(value, unit_prefixes):
+    """Formats a value in the library's short notation (4700 -> '4.7k', 1.5e-9 -> '1n5')"""
+    for prefix, scale in unit_prefixes:
+        if value >= scale * 0.999:
+            scaled = round(value / scale, 3)
+            text = f"{scaled:g}"
+            if prefix in ('p', 'n', 'u') and '.' in text:
+                return text.replace('.', prefix)
+            return text + prefix
+    return f"{value:g}"
+
+RESISTOR_PREFIXES = [('M', 1e6), ('k', 1e3), ('', 1.0), ('m', 1e-3)]
+CAPACITOR_PREFIXES = [('u', 1e-6), ('n', 1e-9), ('p', 1e-12)]
+
+def series_values(series, first_decade, decades):
+    return [round(base * 10 ** decade, 15) for decade in range(first_decade, first_decade + decades) for base in series]
+
+def resistor_rows(count, rng):
+    values = series_values(E24, -1, 8) # 100mΩ .. 91MΩ
+    for i in range(count):
+        value = values[i % len(values)]
+        package, metric, power, voltage = RESISTOR_PACKAGES[(i // len(values)) % len(RESISTOR_PACKAGES)]
+        tolerance = '1%' if rng.random() < 0.8 else '5%'
+        mfg, mpn = RESISTOR_MFGS[rng.randrange(len(RESISTOR_MFGS))]
+        text = rkm(value, RESISTOR_PREFIXES)
+        yield [f"RES-{i + 1:07d}", text, 'INO_Symbols:R', f"INO_Footprints:R_{package}_{metric}",
+               f"{text}Ω {power} {voltage} Thick Film Resistor ±{tolerance} {package} Chip Resistor - Surface Mount RoHS",
+               mfg, mpn.format(package=package, value=text.upper().replace('.', 'R')) + f"{i:07d}",
+               tolerance, package.lstrip('0')]
+
+def capacitor_rows(count, rng):
+    values = series_values(E12, -12, 8) # 1pF .. 82uF
+    for i in range(count):
+        value = values[i % len(values)]
+        package, metric = CAPACITOR_PACKAGES[(i // len(values)) % len(CAPACITOR_PACKAGES)]
+        dielectric = next(name for name, low, high in DIELECTRICS if low <= value <= high)
+        voltage = CAPACITOR_VOLTAGES[rng.randrange(len(CAPACITOR_VOLTAGES))]
+        tolerance = '5%' if dielectric == 'C0G' else '10%'
+        mfg, mpn = CAPACITOR_MFGS[rng.randrange(len(CAPACITOR_MFGS))]
+        text = rkm(value, CAPACITOR_PREFIXES)
+        yield [f"CAP-{i + 1:07d}", text, 'INO_Symbols:C', f"INO_Footprints:C_{package}_{metric}",
+               f"{text}F ±{tolerance} {voltage} Ceramic Capacitor {dielectric} {package}",
+               mfg, mpn.format(package=package, dielectric=dielectric, voltage=voltage.rstrip('V'), value=text) + f"{i:07d}",
+               f"C{rng.randrange(1000, 9999999)}", f"{voltage} {tolerance}", package.lstrip('0'), dielectric]
+
+def inductor_rows(count, rng):
+    values = series_values(E12, -7, 4) # 100nH .. 820uH
+    for i in range(count):
+        value = values[i % len(values)]
+        size = ['252012', '303020', '404020', '606030'][(i // len(values)) % 4]
+        current = f"{rng.choice([0.5, 1, 1.5, 2.2, 3, 4.7, 6])}A"
+        dcr = f"{rng.randrange(10, 900)}mΩ"
+        text = rkm(value, CAPACITOR_PREFIXES)
+        yield [f"IND-{i + 1:07d}", text, 'INO_Symbols:L', f"INO_Footprints:L_{size}",
+               f"{current} {text}H {dcr} ±20% SMD Fixed Inductors RoHS", 'cjiang', f"FTC{size}D{text.upper()}M{i:07d}",
+               f"{current} {dcr}", size]
+
+def ic_rows(count, rng, parameters):
+    for i in range(count):
+        family = IC_FAMILIES[i % len(IC_FAMILIES)]
+        package, footprint = IC_PACKAGES[(i // len(IC_FAMILIES)) % len(IC_PACKAGES)]
+        mpn = f"{family}{rng.randrange(100, 999)}{chr(65 + i % 26)}{i:07d}"
+        row = [f"ICS-{i + 1:07d}", mpn, f"INO_Symbols:{family}", footprint,
+               f"{family} series IC {package} RoHS", rng.choice(['ST', 'TI', 'Microchip', 'Nordic', 'Espressif']),
+               mpn, f"C{rng.randrange(1000, 9999999)}", package]
+        # Wide tables are sparse: most parameters only apply to some families
+        row += [f"{rng.randrange(1, 1000)}" if rng.random() < 0.6 else '' for _ in parameters]
+        yield row
+
+def write_csv(path, headers, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+def generate_library(folder, parts, ic_columns=len(IC_PARAMETERS), seed=0):
+    """
+    Writes the category CSVs for about `parts` parts into folder/Database and
+    returns {csv filename: row count}.
+    """
+    rng = random.Random(seed)
+    database = os.path.join(folder, 'Database')
+    os.makedirs(database, exist_ok=True)
+    counts = {name: int(parts * share) for name, share in MIX}
+    counts['resistors'] += parts - sum(counts.values())
+
+    write_csv(os.path.join(database, 'resistors.csv'),
+              ['part_id', 'value', 'symbol', 'footprint', 'description', 'mfg', 'mpn', 'rating', 'package'],
+              resistor_rows(counts['resistors'], rng))
+    write_csv(os.path.join(database, 'capacitors.csv'),
+              ['part_id', 'value', 'symbol', 'footprint', 'description', 'mfg', 'mpn', 'lcsc', 'rating', 'package', 'dielectric'],
+              capacitor_rows(counts['capacitors'], rng))
+    write_csv(os.path.join(database, 'inductors.csv'),
+              ['part_id', 'value', 'symbol', 'footprint', 'description', 'mfg', 'mpn', 'rating', 'package'],
+              inductor_rows(counts['inductors'], rng))
+    parameters = (IC_PARAMETERS + [f"param_{n:02d}" for n in range(len(IC_PARAMETERS), ic_columns)])[:ic_columns]
+    write_csv(os.path.join(database, 'ics.csv'),
+              ['part_id', 'value', 'symbol', 'footprint', 'description', 'mfg', 'mpn', 'lcsc', 'package'] + parameters,
+              ic_rows(counts['ics'], rng, parameters))
+    return {f"{name}.csv": count for name, count in counts.items()}
+
+def edit_rows(path, fraction, seed=1):
+    """Changes the description of `fraction` of the rows of a CSV in place; returns the number changed"""
+    rng = random.Random(seed)
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    description = rows[0].index('description')
+    body = rows[1:]
+    picked = rng.sample(range(len(body)), max(1, int(len(body) * fraction))) if body else []
+    for i in picked:
+        body[i][description] += ' (rev B)'
+    write_csv(path, rows[0], body)
+    return len(picked)
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip())
+        sys.exit(2)
+    parts = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    for filename, count in generate_library(sys.argv[1], parts).items():
+        print(f"  {filename:<16} {count:>9} rows")
+
+if __name__ == "__main__":
+    main()
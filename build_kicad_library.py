@@ -1,16 +1,33 @@
 import csv
+import contextlib
+import multiprocessing
+import queue
 import sqlite3
 import os
 import sys
 import re
 import json
+import hashlib
+import functools
+import time
+import urllib.request
+import argparse
+import platform
+
+import file_cache
+import footprint_catalog
+import kicad_sexpr
+import model_paths
+import step_geometry
 
 # ==========================================
 # CONFIGURATION
 # ==========================================
 # The script filename: build_kicad_library.py
 
-base_folder = r'C:\INO_Master_Library'
+# Library root: the folder this script lives in (C:\INO_Master_Library in the
+# standard setup). Override with --root, --csv-dir, --db and --dbl.
+base_folder = os.path.dirname(os.path.abspath(__file__))
 database_folder_name = 'Database'
 
 # The actual SQLite database file
@@ -25,15 +42,186 @@ csv_folder = os.path.join(base_folder, database_folder_name)
 db_file = os.path.join(base_folder, db_filename)
 dbl_file = os.path.join(base_folder, dbl_filename)
 
+# The build is written here first and then renamed over db_file in one step
+tmp_db_file = db_file + '.tmp'
+
+# The repo's own KiCad libraries: Symbols/<nickname>.kicad_sym and
+# Footprints/<nickname>.pretty
+symbols_folder = os.path.join(base_folder, 'Symbols')
+footprints_folder = os.path.join(base_folder, 'Footprints')
+models_folder = os.path.join(base_folder, model_paths.MODELS_FOLDER_NAME)
+
+# Process exit codes of the command line
+EXIT_OK = 0
+EXIT_BUILD_ERRORS = 1   # at least one category failed to load
+EXIT_USAGE = 2          # bad arguments (also used by argparse)
+EXIT_NO_INPUT = 3       # Database folder missing or without CSVs
+EXIT_DB_LOCKED = 4      # the new database could not be swapped in
+
+# How long to keep retrying the final rename if the live database is held open
+SWAP_RETRIES = 10
+SWAP_RETRY_DELAY = 0.5 # seconds
+
+# Bulk-load mode: load every changed CSV in one transaction with the pragmas
+# below, then ANALYZE the tables it touched and VACUUM. Safe because the build writes to a
+# temporary file that is flushed to disk (swap_database) before it is
+# swapped in, so a crash mid-build never replaces a good database.
+BULK_LOAD = True
+BULK_LOAD_PAGE_SIZE = 4096 # matches the OS page; a changed value is applied by the final VACUUM
+BULK_LOAD_PRAGMAS = [
+    f"PRAGMA page_size = {BULK_LOAD_PAGE_SIZE}",
+    "PRAGMA journal_mode = MEMORY",  # keeps per-table rollback possible without disk I/O
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -65536",    # 64 MiB
+]
+
+# Storage layout of the category tables:
+#   'rowid'         - SQLite's default; part_id lives in a separate primary-key index
+#   'without_rowid' - rows clustered on part_id, so a lookup by key reads one B-tree
+# Changing it rebuilds every category table on the next run.
+TABLE_LAYOUT = 'rowid'
+
+# Tables with no backing CSV (deleted or renamed categories) are dropped on the
+# next build. With PRUNE_DRY_RUN they are only listed.
+PRUNE_ORPHANS = True
+PRUNE_DRY_RUN = False
+
+# Watch mode (--watch): how often the Database folder is polled, and how long
+# it must stay quiet after a change before a rebuild starts (seconds)
+WATCH_INTERVAL = 0.25
+WATCH_DEBOUNCE = 0.3
+
+# Row-level diffs leave a few free pages behind that later builds reuse.
+# Only rewrite the file once they exceed this share of it.
+VACUUM_FREE_RATIO = 0.25
+
+# Worker processes used to parse CSVs in parallel (None = one per CPU core).
+# Small builds are parsed in-process because starting the workers costs more
+# than it saves.
+PARSE_WORKERS = None
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+
+# Rows are read and inserted in chunks of this size, so peak memory does not
+# grow with the size of vendor dumps. A worker hands its chunks to the loader
+# through a queue of at most PARSE_QUEUE_CHUNKS and waits while it is full.
+CHUNK_ROWS = 5000
+PARSE_QUEUE_CHUNKS = 4
+
 # Columns that KiCad specifically looks for to link symbols/footprints
 SYSTEM_COLUMNS = ['part_id', 'symbol', 'footprint']
 
 # Columns that should be set to "visible_on_add": true
 VISIBLE_COLUMNS = ['value', 'rating']
+
+# Columns that get a secondary index in every table that has them, so lookups
+# by MPN, LCSC code, value or footprint don't scan the table. part_id is
+# already the primary key.
+INDEX_COLUMNS = ([c for c in SYSTEM_COLUMNS + VISIBLE_COLUMNS if c != 'part_id'] + ['mpn', 'lcsc', 'value_si']
+                 + ['voltage_max', 'current_max', 'tolerance_pct', 'resistance_dc', 'height_mm'])
+
+# The 'value' column is also parsed into value_si (REAL, SI base units) and
+# value_unit, so range queries like "caps between 10n and 100n" can use an
+# index. Values without a unit ('22n', '4k7') take the unit of their category.
+VALUE_UNITS = {'capacitors': 'F', 'resistors': 'Ω', 'inductors': 'H'}
+SI_PREFIX_EXPONENTS = {'p': -12, 'n': -9, 'u': -6, 'µ': -6, 'μ': -6, 'm': -3, '': 0, 'R': 0, 'r': 0,
+                       'k': 3, 'K': 3, 'M': 6, 'G': 9}
+UNIT_ALIASES = {'ohm': 'Ω', 'Ohm': 'Ω', 'ohms': 'Ω', 'Ohms': 'Ω', 'hz': 'Hz'}
+# The 'rating' column ('50V 10%', '4.7A 37mΩ') is split the same way into
+# voltage_max, current_max, tolerance_pct and resistance_dc
+RATING_PATTERN = re.compile(r'(?<![\w.])±?(\d+(?:\.\d+)?|\.\d+)\s*([pnuµμmkKM]?)(V|A|%|Ω|[Oo]hms?)(?![A-Za-z])')
+VALUE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?|\.\d+)\s*([pnuµμmkKMGRr]?)(\d*)\s*(Ω|[Oo]hms?|[Hh]z|F|H|V|A|W)?\s*$')
+
+# Categories with a 'footprint' column also get the size of the footprint's
+# 3D model (STEP files only, as placed by the footprint, in mm): height_mm
+# above the board and the body_x / body_y extent. Only footprints of the
+# repo's own .pretty libraries are measured; the boxes are cached in
+# 3D_Models.geometry.json, so a model is only read again after it changes.
+MODEL_GEOMETRY = True
+GEOMETRY_COLUMNS = [('height_mm', 'REAL'), ('body_x', 'REAL'), ('body_y', 'REAL')]
+STEP_EXTENSIONS = ('.step', '.stp')
+
+# A 'footprints' table describes every footprint of the repo's .pretty
+# libraries (pad count, minimum pad pitch, courtyard size in mm, SMD/THT).
+# Its key is '<library>:<footprint>' like the 'footprint' column of the
+# categories, so the two join directly. Set FOOTPRINT_TABLE to None to skip it.
+FOOTPRINT_TABLE = 'footprints'
+FOOTPRINT_COLUMNS = [('footprint', 'TEXT PRIMARY KEY'), ('library', 'TEXT'), ('name', 'TEXT'),
+                     ('pad_count', 'INTEGER'), ('min_pitch', 'REAL'), ('courtyard_width', 'REAL'),
+                     ('courtyard_height', 'REAL'), ('courtyard_area', 'REAL'), ('mount', 'TEXT')]
+FOOTPRINT_INDEX_COLUMNS = ['pad_count', 'min_pitch', 'courtyard_area']
+
+# 'symbols' (one row per symbol of Symbols/*.kicad_sym, keyed like the
+# 'symbol' column of the categories) and 'symbol_pins' (one row per pin and
+# unit; unit 0 holds pins shared by all units). Set SYMBOL_TABLE to None to
+# skip both.
+SYMBOL_TABLE = 'symbols'
+SYMBOL_COLUMNS = [('symbol', 'TEXT PRIMARY KEY'), ('library', 'TEXT'), ('name', 'TEXT'), ('reference', 'TEXT'),
+                  ('unit_count', 'INTEGER'), ('pin_count', 'INTEGER')]
+SYMBOL_INDEX_COLUMNS = ['pin_count']
+SYMBOL_PIN_TABLE = 'symbol_pins'
+SYMBOL_PIN_COLUMNS = [('symbol', 'TEXT'), ('unit', 'INTEGER'), ('number', 'TEXT'), ('name', 'TEXT'),
+                      ('electrical_type', 'TEXT')]
+SYMBOL_PIN_INDEX_COLUMNS = ['symbol', 'name', 'electrical_type']
+UNIT_NAME_PATTERN = re.compile(r'_(\d+)_(\d+)$')
+
+# Full-text search index (FTS5) over these columns of every category, used by
+# search_parts() / search_library.py. Set SEARCH_TABLE to None to skip it.
+SEARCH_TABLE = '_part_search'
+SEARCH_COLUMNS = ['description', 'mpn', 'mfg', 'value', 'package']
+
+# Metadata table inside the database that remembers what each CSV looked like
+# on the last build, so unchanged categories can be skipped
+MANIFEST_TABLE = '_build_manifest'
+
+# After each build, check that every symbol and footprint referenced by the
+# CSVs exists. References to stock KiCad libraries (Device:, Crystal:, ...)
+# are only checked if the KiCad library folders are found through these
+# environment variables (KiCad sets them; they can also be set by hand).
+VALIDATE_REFERENCES = True
+KICAD_SYMBOL_DIR_VARS = ['KICAD9_SYMBOL_DIR', 'KICAD8_SYMBOL_DIR', 'KICAD7_SYMBOL_DIR', 'KICAD_SYMBOL_DIR']
+KICAD_FOOTPRINT_DIR_VARS = ['KICAD9_FOOTPRINT_DIR', 'KICAD8_FOOTPRINT_DIR', 'KICAD7_FOOTPRINT_DIR', 'KICAD_FOOTPRINT_DIR']
 # ==========================================
 # HELPER FUNCTIONS
 # ==========================================
 
+# Console output. --quiet and --json turn off progress messages; errors and
+# warnings then go to stderr, and are always collected so the JSON summary
+# can report them.
+QUIET = False
+build_errors = []
+build_warnings = []
+
+def log(message=""):
+    if not QUIET:
+        print(message)
+
+def log_warning(message):
+    build_warnings.append(message.strip())
+    if QUIET:
+        print(message.strip(), file=sys.stderr)
+    else:
+        print(message)
+
+def log_error(message):
+    build_errors.append(message.strip())
+    if QUIET:
+        print(message.strip(), file=sys.stderr)
+    else:
+        print(message)
+
+def configure_paths(root=None, csv_dir=None, db=None, dbl=None):
+    """Points the builder at a library root; the other paths default to their usual place inside it"""
+    global base_folder, csv_folder, db_file, dbl_file, tmp_db_file, symbols_folder, footprints_folder, models_folder
+    if root:
+        base_folder = os.path.abspath(root)
+    symbols_folder = os.path.join(base_folder, 'Symbols')
+    footprints_folder = os.path.join(base_folder, 'Footprints')
+    models_folder = os.path.join(base_folder, model_paths.MODELS_FOLDER_NAME)
+    csv_folder = os.path.abspath(csv_dir) if csv_dir else os.path.join(base_folder, database_folder_name)
+    db_file = os.path.abspath(db) if db else os.path.join(base_folder, db_filename)
+    dbl_file = os.path.abspath(dbl) if dbl else os.path.join(base_folder, dbl_filename)
+    tmp_db_file = db_file + '.tmp'
+
 def sanitize_sql_name(name):
     """Sanitizes names for SQL tables/columns (e.g. 'Part Number' -> 'Part_Number')"""
     clean = re.sub(r'[ -]', '_', name)
@@ -49,101 +237,1267 @@ def get_column_display_name(col_name):
     if col_name.lower() == 'mfg': return 'Manufacturer'
     return col_name.replace('_', ' ').title()
 
+def iter_csv_chunks(path, chunk_rows=None):
+    """Yields the sanitized header row of a category CSV, then its rows in lists of at most chunk_rows"""
+    if chunk_rows is None:
+        chunk_rows = CHUNK_ROWS
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        try:
+            raw_headers = next(reader)
+        except StopIteration:
+            return
+
+        headers = [sanitize_sql_name(h) for h in raw_headers]
+        width = len(headers)
+        yield headers
+
+        chunk = []
+        for row in reader:
+            # Pad or truncate row to match headers
+            if len(row) < width: row += [''] * (width - len(row))
+            chunk.append(row[:width])
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+@functools.lru_cache(maxsize=None)
+def parse_value(text, default_unit=None):
+    """
+    Parses an engineering-notation value into (value in SI base units, unit).
+
+    Handles '22n', '2u2', '4R7', '100m', '0', '10uF' and '32.768kHz'. The unit
+    falls back to default_unit when the text has none. Returns (None, None)
+    for anything that is not a number (e.g. 'RED' or a part number).
+    """
+    match = VALUE_PATTERN.match(text)
+    if not match:
+        return None, None
+    number, prefix, infix_digits, unit = match.groups()
+    if infix_digits:
+        # '2u2' style: the prefix doubles as the decimal point
+        if '.' in number:
+            return None, None
+        number = f"{number}.{infix_digits}"
+    if prefix in ('R', 'r'):
+        unit = unit or 'Ω'
+    value = float(f"{number}e{SI_PREFIX_EXPONENTS[prefix]}")
+    unit = UNIT_ALIASES.get(unit, unit) or default_unit
+    return value, unit
+
+@functools.lru_cache(maxsize=None)
+def parse_rating(text):
+    """
+    Extracts (voltage_max, current_max, tolerance_pct, resistance_dc) from a
+    free-text rating such as '50V 10%', '75V 150mA', '4.7A 37mΩ' or '1%'.
+    Values are in V, A, % and Ω; fields the text doesn't mention are None.
+    """
+    found = {}
+    for number, prefix, unit in RATING_PATTERN.findall(text):
+        unit = UNIT_ALIASES.get(unit, unit)
+        value = float(f"{number}e{SI_PREFIX_EXPONENTS[prefix]}")
+        # Several figures of the same kind (e.g. '4.7A 6A') keep the largest
+        found[unit] = max(found.get(unit, value), value)
+    return found.get('V'), found.get('A'), found.get('%'), found.get('Ω')
+
+def derived_columns(table_name, headers):
+    """
+    Returns the typed columns computed at build time for a category, as a list
+    of (source column index, parse function, [(column, SQL type), ...]). The
+    parse function maps the source text to one value per column.
+    """
+    lower = [h.lower() for h in headers]
+    groups = []
+    if 'value' in lower:
+        parse = functools.partial(parse_value, default_unit=VALUE_UNITS.get(table_name.lower()))
+        groups.append((lower.index('value'), parse, [('value_si', 'REAL'), ('value_unit', 'TEXT')]))
+    if 'rating' in lower:
+        groups.append((lower.index('rating'), parse_rating, [
+            ('voltage_max', 'REAL'), ('current_max', 'REAL'), ('tolerance_pct', 'REAL'), ('resistance_dc', 'REAL')]))
+    if MODEL_GEOMETRY and 'footprint' in lower:
+        groups.append((lower.index('footprint'), lookup_geometry, GEOMETRY_COLUMNS))
+    # A CSV that already has a column of the same name keeps its own
+    return [g for g in groups if not any(col.lower() in lower for col, _ in g[2])]
+
+def derivation_signature(derived):
+    """
+    Identifies the inputs of a table's derived columns that are not in its
+    CSV (the model geometry), so the table is rebuilt when they change
+    """
+    if any(col_defs == GEOMETRY_COLUMNS for _, _, col_defs in derived):
+        return footprint_geometry_signature
+    return None
+
+def derived_column_defs(derived):
+    """Flattens derived_columns() into [(column, SQL type), ...]"""
+    return [col_def for _, _, col_defs in derived for col_def in col_defs]
+
+def all_columns(table_name, headers):
+    """Names of every column of a category table: the CSV headers plus the derived ones"""
+    return headers + [col for col, _ in derived_column_defs(derived_columns(table_name, headers))]
+
+def add_derived_values(chunks, derived):
+    """Appends the derived column values to every row of every chunk"""
+    for chunk in chunks:
+        # Parse each distinct source string once per chunk; catalogs repeat
+        # the same handful of values and ratings across thousands of rows
+        for index, parse, _ in derived:
+            parsed = {text: parse(text) for text in {row[index] for row in chunk}}
+            for row in chunk:
+                row.extend(parsed[row[index]])
+        yield chunk
+
+# Model geometry of the footprints, loaded by update_database():
+# {'<library>:<footprint>': (height_mm, body_x, body_y)}
+footprint_geometry = {}
+footprint_geometry_signature = None
+NO_GEOMETRY = (None, None, None)
+
+def lookup_geometry(footprint):
+    return footprint_geometry.get(footprint.strip(), NO_GEOMETRY)
+
+def parse_csv_worker(path, table_name, geometry, chunk_rows, chunks_out):
+    """
+    Worker process: reads a category CSV and puts ('headers', headers), then
+    ('rows', chunk) with the derived values already appended, then
+    ('done', None) on chunks_out. A read error is put as ('error', exception).
+    """
+    global footprint_geometry
+    footprint_geometry = geometry # a spawned worker does not inherit it
+    try:
+        chunks = iter_csv_chunks(path, chunk_rows)
+        headers = next(chunks, None)
+        chunks_out.put(('headers', headers))
+        if headers:
+            for chunk in add_derived_values(chunks, derived_columns(table_name, headers)):
+                chunks_out.put(('rows', chunk))
+        chunks_out.put(('done', None))
+    except Exception as e:
+        chunks_out.put(('error', e))
+
+def start_parser(path, table_name):
+    """Starts parse_csv_worker() on a CSV; returns (process, queue)"""
+    chunks_out = multiprocessing.Queue(PARSE_QUEUE_CHUNKS)
+    process = multiprocessing.Process(target=parse_csv_worker, daemon=True,
+                                      args=(path, table_name, footprint_geometry, CHUNK_ROWS, chunks_out))
+    process.start()
+    return process, chunks_out
+
+def parser_messages(process, chunks_out):
+    """Yields the payloads a parser process puts on its queue, re-raising its read error"""
+    while True:
+        try:
+            kind, payload = chunks_out.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                raise OSError(f"the parser process exited with code {process.exitcode}")
+            continue
+        if kind == 'error':
+            raise payload
+        if kind == 'done':
+            return
+        yield payload
+
+def stop_parser(parser):
+    """Ends a parser process, also one whose rows were not all read (e.g. after a failed load)"""
+    process, chunks_out = parser
+    if process.is_alive():
+        process.terminate()
+    process.join()
+    chunks_out.close()
+
+def load_footprint_catalogs():
+    """{library nickname: footprint_catalog entries} for the repo's .pretty libraries"""
+    catalogs = {}
+    for nickname, path in footprint_catalog.library_folders(footprints_folder).items():
+        try:
+            catalogs[nickname] = footprint_catalog.load_catalog(path)
+        except OSError as e:
+            log_warning(f"  [WARNING] Could not read {os.path.basename(path)}: {e}")
+    return catalogs
+
+def load_footprint_geometry(catalogs):
+    """
+    Measures the 3D models of every footprint in `catalogs` and returns ({'<library>:<footprint>': (height_mm, body_x, body_y)},
+    signature of the whole mapping). A footprint with several models gets
+    the box around all of them.
+    """
+    placed = {}  # key: [(model file, placement), ...]
+    index = model_paths.model_index(models_folder) if catalogs and os.path.isdir(models_folder) else {}
+    lookup = model_paths.index_lookup(index)
+    for nickname, catalog in catalogs.items():
+        for name, footprint in catalog.items():
+            for reference, placement in zip(footprint.get('models', []), footprint.get('model_placements', [])):
+                found, _ = model_paths.resolve(reference, index, models_folder, lookup)
+                path = os.path.join(models_folder, found) if found else model_paths.expand_variables(reference)
+                if path and path.lower().endswith(STEP_EXTENSIONS) and os.path.isfile(path):
+                    placed.setdefault(f"{nickname}:{name}", []).append((os.path.abspath(path), placement))
+
+    bboxes = step_geometry.model_bboxes(sorted({path for models in placed.values() for path, _ in models}),
+                                        step_geometry.cache_path(models_folder))
+    geometry = {}
+    for key, models in placed.items():
+        boxes = [step_geometry.placed_bbox(bboxes[path], *placement) for path, placement in models if bboxes.get(path)]
+        if not boxes:
+            continue
+        low = [min(box[0][axis] for box in boxes) for axis in range(3)]
+        high = [max(box[1][axis] for box in boxes) for axis in range(3)]
+        geometry[key] = (round(high[2], 3), round(high[0] - low[0], 3), round(high[1] - low[1], 3))
+    signature = hashlib.sha256(json.dumps(sorted(geometry.items())).encode('utf-8')).hexdigest()
+    return geometry, signature
+
+def create_manifest_table(cursor):
+    """Creates the build manifest table if the database does not have one yet"""
+    cursor.execute(f"""CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+        csv_name TEXT PRIMARY KEY,
+        table_name TEXT,
+        size INTEGER,
+        mtime_ns INTEGER,
+        sha256 TEXT,
+        columns TEXT,
+        row_count INTEGER,
+        derivation TEXT)""")
+    # Manifests written before the derivation column existed
+    if 'derivation' not in [row[1] for row in cursor.execute(f"PRAGMA table_info({MANIFEST_TABLE})")]:
+        cursor.execute(f"ALTER TABLE {MANIFEST_TABLE} ADD COLUMN derivation TEXT")
+
+def load_manifest(cursor):
+    """Reads the build manifest into {csv_name: entry}"""
+    manifest = {}
+    try:
+        rows = cursor.execute(f"SELECT * FROM {MANIFEST_TABLE}")
+    except sqlite3.OperationalError:
+        # Database built before the manifest existed
+        return manifest
+    names = [d[0] for d in rows.description]
+    for values in rows:
+        row = dict(zip(names, values))
+        manifest[row['csv_name']] = {
+            'table_name': row['table_name'],
+            'size': row['size'],
+            'mtime_ns': row['mtime_ns'],
+            'sha256': row['sha256'],
+            'columns': json.loads(row['columns']),
+            'row_count': row['row_count'],
+            'derivation': row.get('derivation')
+        }
+    return manifest
+
+def save_manifest_entry(cursor, csv_name, entry):
+    """Stores (or replaces) the manifest entry for one CSV"""
+    cursor.execute(
+        f"INSERT OR REPLACE INTO {MANIFEST_TABLE} "
+        "(csv_name, table_name, size, mtime_ns, sha256, columns, row_count, derivation) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (csv_name, entry['table_name'], entry['size'], entry['mtime_ns'],
+         entry['sha256'], json.dumps(entry['columns']), entry['row_count'], entry.get('derivation')))
+
+def connect_read_only(path):
+    """Opens an existing database without write access (and without creating it)"""
+    uri = 'file:' + urllib.request.pathname2url(os.path.abspath(path)) + '?mode=ro'
+    return sqlite3.connect(uri, uri=True)
+
+def is_build_table(table_name):
+    """
+    True for SQLite's and the builder's own tables (the latter start with '_'
+    and a letter) and for the tables built from the KiCad libraries
+    """
+    # sanitize_sql_name only ever adds a leading underscore in front of a digit
+    return (table_name.startswith('sqlite_') or re.match(r'_[A-Za-z]', table_name) is not None
+            or table_name in library_table_names())
+
+def find_orphan_tables(live_tables, csv_tables):
+    """Returns the category tables in the database that no CSV produces any more"""
+    return sorted(t for t in live_tables if t not in csv_tables and not is_build_table(t))
+
+def read_live_state():
+    """Returns the manifest of the live database and its tables as {table_name: {'sql', 'indexes'}}"""
+    if not os.path.exists(db_file):
+        return {}, {}
+    conn = connect_read_only(db_file)
+    try:
+        cursor = conn.cursor()
+        manifest = load_manifest(cursor)
+        live_tables = {name: {'sql': sql, 'indexes': set()} for name, sql in
+                       cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='table'")}
+        for name, table_name in cursor.execute("SELECT name, tbl_name FROM sqlite_master WHERE type='index'"):
+            live_tables[table_name]['indexes'].add(name)
+    finally:
+        conn.close()
+    return manifest, live_tables
+
+def index_name(table_name, column):
+    """Name of the builder-managed lookup index on one column"""
+    return f"idx_{table_name}__{column}"
+
+def wanted_indexes(table_name, columns):
+    """Returns {index_name: column} for the configured INDEX_COLUMNS present in a table"""
+    index_cols = {c.lower() for c in INDEX_COLUMNS}
+    return {index_name(table_name, col): col for col in columns if col.lower() in index_cols}
+
+def index_changes(table_name, columns, existing):
+    """Returns (to_create, to_drop) for a table, given the names of its existing indexes"""
+    wanted = wanted_indexes(table_name, columns)
+    ours = {name for name in existing if name.startswith(f"idx_{table_name}__")}
+    to_create = {name: col for name, col in wanted.items() if name not in existing}
+    to_drop = sorted(ours - set(wanted))
+    return to_create, to_drop
+
+def sync_indexes(cursor, table_name, columns):
+    """Creates the configured lookup indexes on a table and drops ones no longer configured"""
+    existing = {name for (name,) in cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=?", (table_name,))}
+    to_create, to_drop = index_changes(table_name, columns, existing)
+    for name in to_drop:
+        cursor.execute(f"DROP INDEX {name}")
+    for name, col in to_create.items():
+        cursor.execute(f"CREATE INDEX {name} ON {table_name} ({col})")
+
+def open_build_database():
+    """Creates the temporary build database next to the live one, seeded with its tables"""
+    for path in (tmp_db_file, tmp_db_file + '-journal'):
+        if os.path.exists(path):
+            os.remove(path)
+    conn = sqlite3.connect(tmp_db_file)
+    if os.path.exists(db_file):
+        # The backup API copies a consistent snapshot even while KiCad is reading
+        live = connect_read_only(db_file)
+        try:
+            live.backup(conn)
+        finally:
+            live.close()
+    return conn
+
+def apply_bulk_load_pragmas(conn):
+    """Switches the build connection to the fast, non-durable bulk-load settings"""
+    for pragma in BULK_LOAD_PRAGMAS:
+        conn.execute(pragma)
+
+def needs_vacuum(cursor):
+    """True if free pages make up a large part of the file, or the page size is not the configured one"""
+    free_pages = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+    page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+    page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+    return free_pages > page_count * VACUUM_FREE_RATIO or page_size != BULK_LOAD_PAGE_SIZE
+
+def create_table_sql(table_name, headers, table_layout, derived=()):
+    """Returns the CREATE TABLE statement for a category. First column is always Primary Key."""
+    col_defs = [f"{col} TEXT PRIMARY KEY" if i==0 else f"{col} TEXT" for i, col in enumerate(headers)]
+    col_defs += [f"{col} {sql_type}" for col, sql_type in derived_column_defs(derived)]
+    sql = f"CREATE TABLE {table_name} ({', '.join(col_defs)})"
+    if table_layout == 'without_rowid':
+        sql += " WITHOUT ROWID"
+    return sql
+
+def load_table(cursor, table_name, headers, chunks, table_layout, derived=()):
+    """
+    Brings a category table in line with the incoming rows.
+
+    If the table already exists with the same schema, the rows are staged in a
+    temp table and only the inserts, updates and deletes are applied, keyed on
+    the first column. Otherwise the table is (re)created and filled directly.
+    The rows in `chunks` must already carry the `derived` columns.
+    Returns (row_count, added, changed, removed, created). After a diff the
+    affected keys are left in temp._changed_keys.
+    """
+    create_sql = create_table_sql(table_name, headers, table_layout, derived)
+    columns = headers + [col for col, _ in derived_column_defs(derived)]
+    placeholders = ", ".join(["?"] * len(columns))
+    key = headers[0]
+    stage = "temp._stage"
+
+    def stage_rows():
+        cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+        cursor.execute(create_table_sql(stage, headers, 'rowid', derived))
+        row_count = 0
+        for chunk in chunks:
+            cursor.executemany(f"INSERT INTO {stage} VALUES ({placeholders})", chunk)
+            row_count += len(chunk)
+        return row_count
+
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+    existing = cursor.fetchone()
+
+    if existing is None or existing[0] != create_sql:
+        removed = 0
+        if existing is not None:
+            removed = cursor.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+            cursor.execute(f"DROP TABLE {table_name}")
+        cursor.execute(create_sql)
+        if table_layout == 'without_rowid':
+            # Appending in key order fills the clustered B-tree without page splits
+            row_count = stage_rows()
+            cursor.execute(f"INSERT INTO {table_name} SELECT * FROM {stage} ORDER BY {key}")
+            cursor.execute(f"DROP TABLE {stage}")
+        else:
+            row_count = 0
+            for chunk in chunks:
+                cursor.executemany(f"INSERT INTO {table_name} VALUES ({placeholders})", chunk)
+                row_count += len(chunk)
+        return row_count, row_count, 0, removed, True
+
+    # Stage the incoming rows next to the live table
+    row_count = stage_rows()
+
+    # Remember which keys are new, different or gone; refresh_search_rows()
+    # uses this to touch only those parts
+    cursor.execute("DROP TABLE IF EXISTS temp._changed_keys")
+    cursor.execute("CREATE TEMP TABLE _changed_keys (key TEXT PRIMARY KEY)")
+    cursor.execute(f"""INSERT INTO temp._changed_keys
+        SELECT {key} FROM (SELECT * FROM {stage} EXCEPT SELECT * FROM {table_name})""")
+    cursor.execute(f"""INSERT INTO temp._changed_keys
+        SELECT {key} FROM {table_name} WHERE {key} NOT IN (SELECT {key} FROM {stage})""")
+
+    cursor.execute(f"DELETE FROM {table_name} WHERE {key} NOT IN (SELECT {key} FROM {stage})")
+    removed = cursor.rowcount
+
+    changed = 0
+    if len(columns) > 1:
+        others = ", ".join(columns[1:])
+        cursor.execute(f"""UPDATE {table_name} SET ({others}) =
+            (SELECT {others} FROM {stage} s WHERE s.{key} = {table_name}.{key})
+            WHERE {key} IN (SELECT key FROM temp._changed_keys)""")
+        changed = cursor.rowcount
+
+    cursor.execute(f"INSERT INTO {table_name} SELECT * FROM {stage} WHERE {key} NOT IN (SELECT {key} FROM {table_name}) ORDER BY {key}")
+    added = cursor.rowcount
+
+    cursor.execute(f"DROP TABLE {stage}")
+    return row_count, added, changed, removed, False
+
+def fts5_available():
+    """True if the sqlite3 module was built with the FTS5 extension"""
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+def search_table_sql():
+    """Returns the CREATE statement of the FTS5 table that indexes every category"""
+    return (f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+            f"part_id UNINDEXED, table_name UNINDEXED, {', '.join(SEARCH_COLUMNS)}, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+
+def ensure_search_table(cursor):
+    """Creates the search tables, or recreates them if SEARCH_COLUMNS changed. True if they start out empty."""
+    row = cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (SEARCH_TABLE,)).fetchone()
+    if row and row[0] == search_table_sql():
+        return False
+    if row:
+        cursor.execute(f"DROP TABLE {SEARCH_TABLE}")
+    cursor.execute(search_table_sql())
+    # Maps each part to its rowid in the FTS table, so single parts can be
+    # replaced without scanning the whole index
+    cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}_rows")
+    cursor.execute(f"""CREATE TABLE {SEARCH_TABLE}_rows (
+        rowid INTEGER PRIMARY KEY, table_name TEXT, part_id TEXT, UNIQUE (table_name, part_id))""")
+    return True
+
+def remove_search_rows(cursor, table_name, changed_only=False):
+    """Removes a category's parts (or only those in temp._changed_keys) from the search table"""
+    where = "table_name = ?"
+    if changed_only:
+        where += " AND part_id IN (SELECT key FROM temp._changed_keys)"
+    cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT rowid FROM {SEARCH_TABLE}_rows WHERE {where})",
+                   (table_name,))
+    cursor.execute(f"DELETE FROM {SEARCH_TABLE}_rows WHERE {where}", (table_name,))
+
+def refresh_search_rows(cursor, table_name, columns, changed_only=False):
+    """Replaces a category's parts (or only those in temp._changed_keys) in the search table"""
+    remove_search_rows(cursor, table_name, changed_only)
+    key = columns[0]
+    where = f"WHERE t.{key} IN (SELECT key FROM temp._changed_keys)" if changed_only else ""
+    cursor.execute(f"INSERT INTO {SEARCH_TABLE}_rows (table_name, part_id) SELECT ?, t.{key} FROM {table_name} t {where}",
+                   (table_name,))
+    by_lower = {col.lower(): col for col in columns}
+    select = ", ".join("t." + by_lower[col.lower()] if col.lower() in by_lower else "''" for col in SEARCH_COLUMNS)
+    cursor.execute(f"""INSERT INTO {SEARCH_TABLE} (rowid, part_id, table_name, {', '.join(SEARCH_COLUMNS)})
+        SELECT r.rowid, t.{key}, ?, {select} FROM {table_name} t
+        JOIN {SEARCH_TABLE}_rows r ON r.table_name = ? AND r.part_id = t.{key} {where}""",
+                   (table_name, table_name))
+
+def search_parts(query, limit=20):
+    """
+    Full-text search over every category of the built database.
+
+    Each word of the query must match (as a prefix) somewhere in the
+    SEARCH_COLUMNS of a part. Returns up to `limit` dicts, best match first.
+    """
+    terms = [t for t in query.split() if re.search(r'\w', t)]
+    if not terms:
+        return []
+    match = " ".join('"' + t.replace('"', '""') + '"*' for t in terms)
+
+    conn = connect_read_only(db_file)
+    try:
+        cursor = conn.execute(
+            f"SELECT table_name, part_id, {', '.join(SEARCH_COLUMNS)} FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH ? ORDER BY rank LIMIT ?", (match, limit))
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+    finally:
+        conn.close()
+
+def min_pad_pitch(pads):
+    """Smallest centre distance between two pads with different numbers (mm), or None"""
+    numbered = sorted((pad[2], pad[3], pad[0]) for pad in pads if pad[0] and pad[1] != 'np_thru_hole')
+    best = None
+    for i, (x, y, number) in enumerate(numbered):
+        for other_x, other_y, other_number in numbered[i + 1:]:
+            # Sorted by x, so once the x gap alone is too big no later pad is closer
+            if best is not None and other_x - x >= best:
+                break
+            if other_number != number:
+                distance = ((other_x - x) ** 2 + (other_y - y) ** 2) ** 0.5
+                if distance > 0 and (best is None or distance < best):
+                    best = distance
+    return round(best, 4) if best is not None else None
+
+def mount_type(footprint):
+    """'SMD' or 'THT' from the footprint's attributes, else from its pads"""
+    if 'smd' in footprint['attr']:
+        return 'SMD'
+    if 'through_hole' in footprint['attr']:
+        return 'THT'
+    pad_types = {pad[1] for pad in footprint['pads']}
+    if 'thru_hole' in pad_types:
+        return 'THT'
+    return 'SMD' if 'smd' in pad_types else None
+
+def footprint_table_rows(catalogs):
+    """Rows of the footprints table, one per footprint of `catalogs`"""
+    rows = []
+    for nickname, catalog in catalogs.items():
+        for name in sorted(catalog, key=str.lower):
+            footprint = catalog[name]
+            if 'error' in footprint:
+                log_warning(f"  [WARNING] Could not parse footprint '{nickname}:{name}': {footprint['error']}")
+                continue
+            width = height = area = None
+            if footprint['courtyard']:
+                xmin, ymin, xmax, ymax = footprint['courtyard']
+                width, height = round(xmax - xmin, 4), round(ymax - ymin, 4)
+                area = round(width * height, 4)
+            rows.append((f"{nickname}:{name}", nickname, name, footprint['pad_count'],
+                         min_pad_pitch(footprint['pads']), width, height, area, mount_type(footprint)))
+    return rows
+
+def symbol_libraries():
+    """{library nickname: .kicad_sym path} for the repo's symbol libraries"""
+    if not os.path.isdir(symbols_folder):
+        return {}
+    return {os.path.splitext(name)[0]: os.path.join(symbols_folder, name)
+            for name in sorted(os.listdir(symbols_folder)) if name.endswith('.kicad_sym')}
+
+def symbol_pins(node):
+    """[(unit, number, name, electrical type)] of a parsed symbol, from its unit sub-symbols"""
+    pins = []
+    for child in node[2:]:
+        if not isinstance(child, list) or not child:
+            continue
+        if child[0] == 'pin':
+            pins.append((0, child))
+        elif child[0] == 'symbol':
+            # Units are named <symbol>_<unit>_<body style>; body style 2 is
+            # the De Morgan alternate, which repeats the pins of style 1
+            m = UNIT_NAME_PATTERN.search(child[1])
+            if m is None or int(m.group(2)) > 1:
+                continue
+            pins.extend((int(m.group(1)), pin) for pin in kicad_sexpr.children(child, 'pin'))
+    rows = []
+    for unit, pin in pins:
+        number = kicad_sexpr.children(pin, 'number')
+        name = kicad_sexpr.children(pin, 'name')
+        rows.append((unit, number[0][1] if number else None, name[0][1] if name else None, pin[1]))
+    return rows
+
+def symbol_table_rows(libraries, indexes):
+    """
+    Rows of the symbols and symbol_pins tables. Each symbol is read through
+    its byte range in the library index and parsed on its own, so memory
+    stays at one symbol. Derived symbols ((extends ...)) get their parent's pins.
+    """
+    symbol_rows = []
+    pin_rows = []
+    for nickname, path in libraries.items():
+        parsed = {}
+        with open(path, 'rb') as f:
+            for name, (kind, start, end, _) in indexes[nickname].items():
+                f.seek(start)
+                try:
+                    node = kicad_sexpr.parse(f.read(end - start))
+                except (ValueError, UnicodeDecodeError) as e:
+                    log_warning(f"  [WARNING] Could not parse symbol '{nickname}:{name}': {e}")
+                    continue
+                extends = kicad_sexpr.children(node, 'extends')
+                reference = next((p[2] for p in kicad_sexpr.children(node, 'property') if p[1] == 'Reference'), None)
+                parsed[name] = (extends[0][1] if extends else None, reference, symbol_pins(node))
+        for name in sorted(parsed, key=str.lower):
+            parent, reference, pins = parsed[name]
+            if parent in parsed and not pins:
+                pins = parsed[parent][2]
+            key = f"{nickname}:{name}"
+            units = {unit for unit, _, _, _ in pins if unit}
+            symbol_rows.append((key, nickname, name, reference, max(units, default=1),
+                                len({number for _, number, _, _ in pins})))
+            pin_rows.extend((key,) + pin for pin in pins)
+    return symbol_rows, pin_rows
+
+def library_sources(catalogs):
+    """
+    The tables built from the KiCad libraries instead of a CSV, as a list of
+    {'name', 'signature', 'tables', 'rows'}: tables is {table_name: (columns,
+    index columns)} and rows() returns {table_name: rows}. rows() is only
+    called when the signature differs from the one in the manifest, which
+    keeps the entry under 'name'.
+    """
+    sources = []
+    if FOOTPRINT_TABLE:
+        rows = footprint_table_rows(catalogs)
+        sources.append({
+            'name': FOOTPRINT_TABLE,
+            'signature': hashlib.sha256(json.dumps(rows).encode('utf-8')).hexdigest(),
+            'tables': {FOOTPRINT_TABLE: (FOOTPRINT_COLUMNS, FOOTPRINT_INDEX_COLUMNS)},
+            'rows': lambda: {FOOTPRINT_TABLE: rows},
+        })
+    if SYMBOL_TABLE:
+        libraries = symbol_libraries()
+        indexes = {}
+        for nickname, path in libraries.items():
+            try:
+                indexes[nickname] = kicad_sexpr.node_index(path)
+            except (OSError, ValueError) as e:
+                log_warning(f"  [WARNING] Could not read {os.path.basename(path)}: {e}")
+        libraries = {nickname: path for nickname, path in libraries.items() if nickname in indexes}
+        # The index already hashes every symbol, so the tables are only
+        # parsed again when a symbol changed
+        digests = sorted((nickname, name, entry[3]) for nickname, index in indexes.items() for name, entry in index.items())
+
+        def symbol_rows():
+            symbols, pins = symbol_table_rows(libraries, indexes)
+            return {SYMBOL_TABLE: symbols, SYMBOL_PIN_TABLE: pins}
+        sources.append({
+            'name': SYMBOL_TABLE,
+            'signature': hashlib.sha256(json.dumps(digests).encode('utf-8')).hexdigest(),
+            'tables': {SYMBOL_TABLE: (SYMBOL_COLUMNS, SYMBOL_INDEX_COLUMNS),
+                       SYMBOL_PIN_TABLE: (SYMBOL_PIN_COLUMNS, SYMBOL_PIN_INDEX_COLUMNS)},
+            'rows': symbol_rows,
+        })
+    return sources
+
+def library_table_names():
+    return {name for name in [FOOTPRINT_TABLE, SYMBOL_TABLE, SYMBOL_TABLE and SYMBOL_PIN_TABLE] if name}
+
+def library_table_sql(table_name, columns):
+    return f"CREATE TABLE {table_name} ({', '.join(f'{col} {sql_type}' for col, sql_type in columns)})"
+
+def load_library_table(cursor, table_name, columns, rows, index_columns=()):
+    """Replaces a library table with `rows` (these tables are small, so it is simply rebuilt)"""
+    cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+    cursor.execute(library_table_sql(table_name, columns))
+    cursor.executemany(f"INSERT INTO {table_name} VALUES ({', '.join('?' * len(columns))})", rows)
+    for col in index_columns:
+        cursor.execute(f"CREATE INDEX {index_name(table_name, col)} ON {table_name} ({col})")
+
+def fsync_path(path):
+    """Flushes a file to disk; on POSIX also works for a folder (the entries of a rename)"""
+    # Windows can only flush a handle opened for writing
+    fd = os.open(path, os.O_RDONLY if os.path.isdir(path) else os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def copy_into_live_database():
+    """
+    Writes the temporary build into the live database file through SQLite's
+    backup API. That is one write transaction under SQLite's own locking,
+    so it works while other programs hold the file open (where a rename
+    fails on Windows), and readers see either the old or the new database.
+    """
+    source = sqlite3.connect(tmp_db_file)
+    try:
+        target = sqlite3.connect(db_file, timeout=SWAP_RETRIES * SWAP_RETRY_DELAY)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+def swap_database():
+    """Atomically replaces the live database with the temporary build"""
+    # The build ran with synchronous = OFF, so make sure the whole file is on
+    # disk before it takes the live name; otherwise a power loss right after
+    # the rename could leave a torn file in place of a good database
+    fsync_path(tmp_db_file)
+    # On Windows the rename fails while another process holds the file open
+    # without delete sharing, so give short-lived ODBC connections a moment to close
+    for attempt in range(SWAP_RETRIES):
+        try:
+            os.replace(tmp_db_file, db_file)
+            if os.name == 'posix':
+                fsync_path(os.path.dirname(db_file))
+            return
+        except PermissionError:
+            time.sleep(SWAP_RETRY_DELAY)
+    # Still held open (KiCad keeps its connection): update the file in place
+    try:
+        copy_into_live_database()
+        with contextlib.suppress(OSError):
+            os.remove(tmp_db_file)
+        log(f"  [OK] {os.path.basename(db_file)} is in use; the build was written into it in place.")
+        return
+    except (sqlite3.Error, OSError) as e:
+        log(f"    {e}")
+    log_error(f"\n!!! ERROR: COULD NOT REPLACE {os.path.basename(db_file)}. CLOSE KICAD AND RUN AGAIN !!!")
+    log(f"    The new build was kept in {tmp_db_file}")
+    sys.exit(EXIT_DB_LOCKED)
+
+# ==========================================
+# BUILD PROFILE
+# ==========================================
+
+# One record per timed phase of the last build, in the order they finished:
+# {'phase', 'table', 'seconds', 'rows', 'peak_rss_bytes'}. Collecting them
+# costs a few timer calls per chunk, so it is always on; --profile prints
+# them and --profile-report writes them to a JSON file.
+profile_records = []
+
+def windows_peak_working_set():
+    """Peak working set of this process via psapi, or None if it can't be read"""
+    import ctypes
+    from ctypes import wintypes
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in (
+                'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.WinDLL('kernel32')
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    get_info = kernel32.K32GetProcessMemoryInfo
+    get_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+    if not get_info(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+def peak_rss_bytes(children=False):
+    """Peak resident memory of this process (or of its finished parser workers) so far, in bytes"""
+    try:
+        import resource
+    except ImportError:
+        if os.name == 'nt' and not children:
+            try:
+                return windows_peak_working_set()
+            except (OSError, AttributeError):
+                return None
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes, except on macOS where it is in bytes
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+def record_phase(phase, seconds, table=None, rows=None):
+    profile_records.append({
+        'phase': phase,
+        'table': table,
+        'seconds': seconds,
+        'rows': rows,
+        'peak_rss_bytes': peak_rss_bytes()
+    })
+
+@contextlib.contextmanager
+def timed(phase, table=None):
+    """Records the with-block as one phase; set ['rows'] on the yielded dict to get rows/s"""
+    result = {'rows': None}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        record_phase(phase, time.perf_counter() - start, table, result['rows'])
+
+def timed_chunks(chunks, totals):
+    """Passes the chunks through, adding the time spent producing them and their rows to `totals`"""
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        totals['seconds'] += time.perf_counter() - start
+        if chunk is None:
+            return
+        totals['rows'] += len(chunk)
+        yield chunk
+
+def profile_totals():
+    """Sums the records per phase, in order of first appearance"""
+    totals = {}
+    for record in profile_records:
+        total = totals.setdefault(record['phase'], {'phase': record['phase'], 'seconds': 0.0, 'rows': None})
+        total['seconds'] += record['seconds']
+        if record['rows'] is not None:
+            total['rows'] = (total['rows'] or 0) + record['rows']
+    return list(totals.values())
+
+def rows_per_second(record):
+    if record['rows'] and record['seconds'] > 0:
+        return record['rows'] / record['seconds']
+    return None
+
+def profile_report():
+    """The profile of the last build as a JSON-ready dict"""
+    def with_rate(record):
+        rate = rows_per_second(record)
+        return dict(record, seconds=round(record['seconds'], 6),
+                    rows_per_second=round(rate, 1) if rate is not None else None)
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'total_seconds': round(sum(r['seconds'] for r in profile_records), 6),
+        'peak_rss_bytes': peak_rss_bytes(),
+        'peak_rss_workers_bytes': peak_rss_bytes(children=True),
+        'phases': [with_rate(r) for r in profile_totals()],
+        'records': [with_rate(r) for r in profile_records],
+    }
+
+def print_profile():
+    """Prints the per-table and per-phase timings of the last build"""
+    def line(name, table, record):
+        rate = rows_per_second(record)
+        rss = record.get('peak_rss_bytes')
+        print(f"  {name:<10} {table:<24} {record['seconds']:>9.3f}s "
+              f"{record['rows'] if record['rows'] is not None else '':>9} "
+              f"{f'{rate:,.0f}/s' if rate is not None else '':>12} "
+              f"{f'{rss / 2**20:.1f} MB' if rss else '':>10}")
+
+    print("-" * 50)
+    print("BUILD PROFILE")
+    print(f"  {'phase':<10} {'table':<24} {'time':>10} {'rows':>9} {'rows/s':>12} {'peak RSS':>10}")
+    for record in profile_records:
+        line(record['phase'], record['table'] or '', record)
+    print("  " + "-" * 80)
+    for total in profile_totals():
+        line(total['phase'], '(total)', total)
+    rss = peak_rss_bytes()
+    print(f"  {'build':<10} {'(total)':<24} {sum(r['seconds'] for r in profile_records):>9.3f}s "
+          f"{'':>9} {'':>12} {f'{rss / 2**20:.1f} MB' if rss else '':>10}")
+
+def write_profile_report(path):
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(profile_report(), f, indent=2)
+        log(f"  [OK] Profile written to {path}")
+    except OSError as e:
+        log_error(f"  [ERROR] Could not write profile report: {e}")
+
 # ==========================================
 # PHASE 1: GENERATE SQLITE DATABASE
 # ==========================================
 
-def update_database():
-    print("PHASE 1: Updating SQLite Database...")
+def keep_previous_table(cursor, table_info, previous, live_tables, status='failed'):
+    """
+    After a category failed to load: keeps it in the build result (and so in
+    the .kicad_dbl) as `status` with its last good columns if the previous
+    table is still in the database unchanged. Returns False if it isn't and
+    the category has to be left out. One bad row must not make KiCad lose
+    the whole category.
+    """
+    table_name = table_info['table_name']
+    current = cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table_name,)).fetchone()
+    if (previous and previous['table_name'] == table_name and table_name in live_tables
+            and current and current[0] == live_tables[table_name]['sql']):
+        table_info.update(columns=previous['columns'], status=status, rows=previous['row_count'])
+        log(f"  [KEPT] Table '{table_name}' keeps its last good build ({previous['row_count']} parts).")
+        return True
+    return False
+
+def update_database(bulk_load=None, parse_workers=None, prune_orphans=None, prune_dry_run=None,
+                    table_layout=None, categories=None):
+    """
+    Brings the SQLite database in line with the CSVs and returns the table
+    metadata for generate_kicad_dbl(). `categories` limits the rebuild to some
+    CSVs (by file or table name); the others keep their last built state.
+    """
+    if bulk_load is None:
+        bulk_load = BULK_LOAD
+    if table_layout is None:
+        table_layout = TABLE_LAYOUT
+    if parse_workers is None:
+        parse_workers = PARSE_WORKERS or os.cpu_count() or 1
+    if prune_orphans is None:
+        prune_orphans = PRUNE_ORPHANS
+    if prune_dry_run is None:
+        prune_dry_run = PRUNE_DRY_RUN
+
+    global footprint_geometry, footprint_geometry_signature
+
+    build_errors.clear()
+    build_warnings.clear()
+    del profile_records[:]
+    log("PHASE 1: Updating SQLite Database...")
     
     if not os.path.exists(csv_folder):
-        print(f"ERROR: Database folder not found: {csv_folder}")
+        log_error(f"ERROR: Database folder not found: {csv_folder}")
         return []
 
     csv_files = [f for f in os.listdir(csv_folder) if f.lower().endswith('.csv')]
     if not csv_files:
-        print("No CSV files found.")
+        log_error("No CSV files found.")
         return []
 
-    conn = sqlite3.connect(db_file)
-    cursor = conn.cursor()
-    
+    with timed('catalog'):
+        catalogs = load_footprint_catalogs() if MODEL_GEOMETRY or FOOTPRINT_TABLE else {}
+    if MODEL_GEOMETRY:
+        with timed('geometry'):
+            footprint_geometry, footprint_geometry_signature = load_footprint_geometry(catalogs)
+    scan_start = time.perf_counter()
+    sources = library_sources(catalogs)
+    reserved = library_table_names()
+
     # We will store metadata about processed tables to generate the JSON later
     # Format: {'table_name': 'Capacitor', 'csv_name': 'Capacitors', 'columns': ['part_id', 'val'...]}
     processed_tables = []
 
+    # CSVs that need their table rebuilt: (filename, table metadata, manifest entry)
+    pending = []
+    # Manifest entries whose content is unchanged but whose mtime moved
+    refreshed = {}
+    # Unchanged tables whose indexes don't match INDEX_COLUMNS
+    reindex = []
+
+    manifest, live_tables = read_live_state()
+
+    if categories is not None:
+        categories = {c.lower() for c in categories}
+
     for filename in csv_files:
         full_csv_path = os.path.join(csv_folder, filename)
         
         # 1. Determine Table Name
         raw_name = os.path.splitext(filename)[0]
         table_name = sanitize_sql_name(raw_name)
-        
-        # 2. Read Headers & Data
-        rows_to_insert = []
-        headers = []
-        
-        try:
-            with open(full_csv_path, 'r', encoding='utf-8-sig') as f:
-                reader = csv.reader(f)
-                try:
-                    raw_headers = next(reader)
-                except StopIteration:
-                    print(f"  [SKIPPING] Empty file: {filename}")
-                    continue
-
-                headers = [sanitize_sql_name(h) for h in raw_headers]
-                
-                # Check for required primary key in first column
-                if not headers: continue
+        table_info = {
+            'display_name': raw_name.replace('_', ' ').title(), # e.g. "Capacitors"
+            'table_name': table_name,
+            'columns': []
+        }
+        previous = manifest.get(filename)
 
-                for row in reader:
-                    # Pad or truncate row to match headers
-                    if len(row) < len(headers): row += [''] * (len(headers) - len(row))
-                    row = row[:len(headers)]
-                    rows_to_insert.append(row)
+        if table_name in reserved:
+            log_error(f"  [ERROR] {filename}: the table name '{table_name}' is used by the library tables.")
+            continue
 
-        except Exception as e:
-            print(f"  [ERROR] Could not read {filename}: {e}")
+        # Categories left out of a partial build keep whatever was built last
+        if categories is not None and not {raw_name.lower(), table_name.lower()} & categories:
+            if previous and table_name in live_tables:
+                table_info.update(columns=previous['columns'], status='skipped', rows=previous['row_count'])
+                processed_tables.append(table_info)
             continue
 
-        # 3. Update SQL
-        try:
-            cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
-            
-            # Create columns. First column is always Primary Key.
-            col_defs = [f"{col} TEXT PRIMARY KEY" if i==0 else f"{col} TEXT" for i, col in enumerate(headers)]
-            cursor.execute(f"CREATE TABLE {table_name} ({', '.join(col_defs)})")
-            
-            placeholders = ", ".join(["?"] * len(headers))
-            cursor.executemany(f"INSERT INTO {table_name} VALUES ({placeholders})", rows_to_insert)
-            conn.commit()
+        # 2. Skip the CSV if it is unchanged since the last build.
+        # Size + mtime is the cheap check; the content hash catches files
+        # that were only touched or re-saved without edits.
+        stat = os.stat(full_csv_path)
+        entry = {
+            'table_name': table_name,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': None
+        }
+        previous_derived = derived_columns(table_name, previous['columns']) if previous else []
+        if (previous and previous['table_name'] == table_name and table_name in live_tables
+                and live_tables[table_name]['sql'] == create_table_sql(
+                    table_name, previous['columns'], table_layout, previous_derived)
+                and previous['derivation'] == derivation_signature(previous_derived)):
+            unchanged = previous['size'] == entry['size'] and previous['mtime_ns'] == entry['mtime_ns']
+            if not unchanged and previous['size'] == entry['size']:
+                entry['sha256'] = file_cache.hash_file(full_csv_path)
+                unchanged = entry['sha256'] == previous['sha256']
+                if unchanged:
+                    # Same content, new timestamp: remember it so the next run takes the fast path
+                    refreshed[filename] = dict(previous, mtime_ns=entry['mtime_ns'])
+            if unchanged:
+                log(f"  [UNCHANGED] Table '{table_name}' ({previous['row_count']} parts).")
+                table_info.update(columns=previous['columns'], status='unchanged', rows=previous['row_count'])
+                processed_tables.append(table_info)
+                if any(index_changes(table_name, all_columns(table_name, previous['columns']),
+                                     live_tables[table_name]['indexes'])):
+                    reindex.append(table_info)
+                continue
+
+        pending.append((filename, table_info, entry))
+        processed_tables.append(table_info)
+
+    # 3. Reconcile: tables and manifest entries with no CSV behind them any more
+    csv_tables = {sanitize_sql_name(os.path.splitext(f)[0]) for f in csv_files}
+    orphans = find_orphan_tables(live_tables, csv_tables)
+    stale_entries = [name for name in manifest if name not in csv_files and name not in {s['name'] for s in sources}]
+    for table_name in orphans:
+        if prune_dry_run:
+            log_warning(f"  [ORPHAN] Table '{table_name}' has no CSV (dry run, would be removed).")
+        elif prune_orphans:
+            log_warning(f"  [ORPHAN] Table '{table_name}' has no CSV, removing it.")
+        else:
+            log_warning(f"  [ORPHAN] Table '{table_name}' has no CSV (kept).")
+    if prune_dry_run or not prune_orphans:
+        orphans = []
+
+    # The search index needs a full refill if it is missing or its columns changed
+    search_stale = (SEARCH_TABLE is not None and fts5_available()
+                    and live_tables.get(SEARCH_TABLE, {}).get('sql') != search_table_sql())
+
+    # Library tables whose source changed (or that are missing or reshaped)
+    stale_sources = [source for source in sources
+                     if manifest.get(source['name'], {}).get('sha256') != source['signature']
+                     or any(live_tables.get(table_name, {}).get('sql') != library_table_sql(table_name, columns)
+                            for table_name, (columns, _) in source['tables'].items())]
+
+    record_phase('scan', time.perf_counter() - scan_start)
+
+    if (not pending and not refreshed and not orphans and not stale_entries and not reindex and not search_stale
+            and not stale_sources):
+        log("  Database is up to date.")
+        return processed_tables
+
+    # 4. Build into a temporary copy of the database. KiCad keeps reading the
+    # live file until the finished build is swapped in below.
+    prepare_start = time.perf_counter()
+    conn = open_build_database()
+    cursor = conn.cursor()
+    if bulk_load:
+        apply_bulk_load_pragmas(conn)
+        # One transaction for the whole build; each table gets a savepoint
+        cursor.execute("BEGIN")
+    create_manifest_table(cursor)
+    for filename, entry in refreshed.items():
+        save_manifest_entry(cursor, filename, entry)
+    for table_name in orphans:
+        cursor.execute(f'DROP TABLE "{table_name}"')
+    for filename in stale_entries:
+        cursor.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE csv_name = ?", (filename,))
+
+    # Full-text search index across all categories
+    search_enabled = SEARCH_TABLE is not None and fts5_available()
+    search_rebuilt = search_enabled and ensure_search_table(cursor)
+    if search_enabled:
+        for table_name in orphans:
+            remove_search_rows(cursor, table_name)
+    elif SEARCH_TABLE is not None:
+        log_warning("  [WARNING] This Python's SQLite has no FTS5; search index not built.")
+    if not bulk_load:
+        conn.commit()
+    record_phase('prepare', time.perf_counter() - prepare_start)
+
+    # 5. Read Headers & Data. Parsing is independent per CSV, so large builds
+    # fan it out over worker processes while this process stays the only
+    # writer: each worker reads one CSV, appends the derived columns and
+    # streams the chunks back through a bounded queue. Workers run at most
+    # parse_workers CSVs ahead of the loader, so memory stays flat however
+    # big the CSVs are. Without workers the rows are read and inserted here
+    # chunk by chunk.
+    pending_bytes = sum(entry['size'] for _, _, entry in pending)
+    use_workers = parse_workers > 1 and len(pending) > 1 and pending_bytes >= PARALLEL_MIN_BYTES
+    parsers = [None] * len(pending)
+    started = 0
+    # Tables written by this build; only their planner statistics are refreshed
+    touched = []
+
+    try:
+        for i, (filename, table_info, entry) in enumerate(pending):
+            full_csv_path = os.path.join(csv_folder, filename)
+            table_name = table_info['table_name']
+            while use_workers and started < min(len(pending), i + parse_workers):
+                parsers[started] = start_parser(os.path.join(csv_folder, pending[started][0]),
+                                                pending[started][1]['table_name'])
+                started += 1
+            if i and parsers[i - 1]:
+                stop_parser(parsers[i - 1])
+                parsers[i - 1] = None
+
+            # Reading is interleaved with inserting, so the generators keep
+            # their own time and load_table() gets the remainder
+            read = {'seconds': 0.0, 'rows': 0}
+            read_start = time.perf_counter()
+            if entry['sha256'] is None:
+                entry['sha256'] = file_cache.hash_file(full_csv_path)
+
+            try:
+                if parsers[i] is None:
+                    chunks = iter_csv_chunks(full_csv_path)
+                else:
+                    chunks = parser_messages(*parsers[i])
+                headers = next(chunks, None)
+                header_seconds = read['seconds'] = time.perf_counter() - read_start
+                chunks = timed_chunks(chunks, read)
+            except Exception as e:
+                log_error(f"  [ERROR] Could not read {filename}: {e}")
+                if not keep_previous_table(cursor, table_info, manifest.get(filename), live_tables):
+                    processed_tables.remove(table_info)
+                continue
+
+            # An empty CSV (or one without a header row) is not an error, but
+            # it is reported, and the category keeps its last build as 'kept'
+            if not headers:
+                log_warning(f"  [SKIPPING] {'Empty file' if headers is None else 'No header row'}: {filename}")
+                if not keep_previous_table(cursor, table_info, manifest.get(filename), live_tables, status='kept'):
+                    processed_tables.remove(table_info)
+                continue
+
+            # 6. Update SQL
+            try:
+                # Without bulk load the savepoint is the table's own transaction:
+                # DROP/CREATE TABLE would otherwise autocommit and a failed load
+                # could not be undone
+                cursor.execute("SAVEPOINT load_table")
+                derived = derived_columns(table_name, headers)
+                produced = {'seconds': 0.0, 'rows': 0}
+                if parsers[i] is None:
+                    chunks = add_derived_values(chunks, derived)  # workers send them already derived
+                chunks = timed_chunks(chunks, produced)
+                load_start = time.perf_counter()
+                row_count, added, changed, removed, created = load_table(
+                    cursor, table_name, headers, chunks, table_layout, derived)
+                load_seconds = time.perf_counter() - load_start
+                record_phase('read', read['seconds'], table_name, row_count)
+                if derived:
+                    # produced[] includes the read time of every chunk after the headers
+                    record_phase('derive', produced['seconds'] - (read['seconds'] - header_seconds), table_name, row_count)
+                record_phase('load', load_seconds - produced['seconds'], table_name, row_count)
+                with timed('index', table_name):
+                    sync_indexes(cursor, table_name, all_columns(table_name, headers))
+                if search_enabled and not search_rebuilt:
+                    with timed('search', table_name) as search:
+                        refresh_search_rows(cursor, table_name, headers, changed_only=not created)
+                        search['rows'] = row_count if created else added + changed + removed
+
+                with timed('commit', table_name):
+                    entry['columns'] = headers
+                    entry['row_count'] = row_count
+                    entry['derivation'] = derivation_signature(derived)
+                    save_manifest_entry(cursor, filename, entry)
+                    cursor.execute("RELEASE load_table")
+                    if not bulk_load:
+                        conn.commit()
             
-            print(f"  [OK] Table '{table_name}' created ({len(rows_to_insert)} parts).")
+                if created:
+                    log(f"  [OK] Table '{table_name}' created ({row_count} parts).")
+                else:
+                    log(f"  [OK] Table '{table_name}' updated ({row_count} parts: "
+                          f"{added} added, {changed} changed, {removed} removed).")
             
-            # Save metadata for JSON generation
-            processed_tables.append({
-                'display_name': raw_name.replace('_', ' ').title(), # e.g. "Capacitors"
-                'table_name': table_name,
-                'columns': headers
-            })
-
-        except sqlite3.OperationalError as e:
-            if "locked" in str(e):
-                print("\n!!! ERROR: DATABASE LOCKED. CLOSE KICAD !!!")
-                sys.exit(1)
-            print(f"  [SQL ERROR] {e}")
+                touched.append(table_name)
+
+                # Save metadata for JSON generation
+                table_info['columns'] = headers
+                table_info.update(status='created' if created else 'updated', rows=row_count,
+                                  added=added, changed=changed, removed=removed)
+
+            except (sqlite3.Error, csv.Error, UnicodeDecodeError, OSError) as e:
+                cursor.execute("ROLLBACK TO load_table")
+                cursor.execute("RELEASE load_table")
+                if not bulk_load:
+                    conn.commit()
+                if isinstance(e, sqlite3.Error):
+                    log_error(f"  [SQL ERROR] {table_name}: {e}")
+                else:
+                    log_error(f"  [ERROR] Could not read {filename}: {e}")
+                if not keep_previous_table(cursor, table_info, manifest.get(filename), live_tables):
+                    processed_tables.remove(table_info)
+
+    finally:
+        # Also ends parsers whose CSV was never loaded (a failed load, an error)
+        for parser in parsers:
+            if parser:
+                stop_parser(parser)
 
+    for source in stale_sources:
+        with timed('library', source['name']) as library:
+            try:
+                cursor.execute("SAVEPOINT load_table")
+                all_rows = source['rows']()
+                for table_name, (columns, index_columns) in source['tables'].items():
+                    load_library_table(cursor, table_name, columns, all_rows[table_name], index_columns)
+                first = next(iter(source['tables']))
+                save_manifest_entry(cursor, source['name'], {
+                    'table_name': first, 'size': None, 'mtime_ns': None, 'sha256': source['signature'],
+                    'columns': [col for col, _ in source['tables'][first][0]], 'row_count': len(all_rows[first])})
+                cursor.execute("RELEASE load_table")
+                if not bulk_load:
+                    conn.commit()
+                touched.extend(source['tables'])
+                library['rows'] = sum(len(rows) for rows in all_rows.values())
+                for table_name, rows in all_rows.items():
+                    log(f"  [OK] Table '{table_name}' rebuilt from the KiCad libraries ({len(rows)} rows).")
+            except sqlite3.Error as e:
+                cursor.execute("ROLLBACK TO load_table")
+                cursor.execute("RELEASE load_table")
+                if not bulk_load:
+                    conn.commit()
+                log_error(f"  [SQL ERROR] {source['name']}: {e}")
+
+    for table_info in reindex:
+        with timed('index', table_info['table_name']):
+            sync_indexes(cursor, table_info['table_name'], all_columns(table_info['table_name'], table_info['columns']))
+        touched.append(table_info['table_name'])
+        log(f"  [OK] Table '{table_info['table_name']}' indexes updated.")
+
+    # A new (or reshaped) search table has to be filled from every category
+    if search_rebuilt:
+        with timed('search') as search:
+            for table_info in processed_tables:
+                refresh_search_rows(cursor, table_info['table_name'], table_info['columns'])
+            search['rows'] = sum(t['rows'] for t in processed_tables)
+            if not bulk_load:
+                conn.commit()
+
+    if bulk_load:
+        with timed('commit'):
+            conn.commit()
+        # Refresh the planner statistics of the tables this build wrote (a
+        # bare ANALYZE would rescan the whole database for a one-row edit),
+        # then compact the file if dropped tables left free pages behind (a
+        # fresh build has none, so skip the rewrite)
+        with timed('analyze'):
+            for table_name in touched:
+                cursor.execute(f"ANALYZE {table_name}")
+        if needs_vacuum(cursor):
+            with timed('vacuum'):
+                cursor.execute("VACUUM")
     conn.close()
+
+    # 7. Swap the finished database in
+    with timed('swap'):
+        swap_database()
     return processed_tables
 
 # ==========================================
 # PHASE 2: GENERATE KICAD DBL JSON
 # ==========================================
 
+def dbl_database_path():
+    """The database path as written into the .kicad_dbl; ${CWD} is the folder of the .kicad_dbl itself"""
+    try:
+        relative = os.path.relpath(db_file, os.path.dirname(dbl_file))
+    except ValueError:
+        # Different drives on Windows
+        return db_file.replace('\\', '/')
+    return "${CWD}/" + relative.replace('\\', '/')
+
 def generate_kicad_dbl(tables_data):
-    print("-" * 50)
-    print("PHASE 2: Generating 'library_link.kicad_dbl'...")
+    """Writes the .kicad_dbl for the built tables (timed as the 'dbl' phase)"""
+    with timed('dbl'):
+        write_kicad_dbl(tables_data)
+
+def write_kicad_dbl(tables_data):
+    log("-" * 50)
+    log(f"PHASE 2: Generating '{os.path.basename(dbl_file)}'...")
 
     # Base Structure
     dbl_data = {
@@ -156,7 +1510,7 @@ def generate_kicad_dbl(tables_data):
             "username": "",
             "password": "",
             "timeout_seconds": 2,
-            "connection_string": "Driver={SQLite3 ODBC Driver};Database=${CWD}/" + db_filename + ";"
+            "connection_string": "Driver={SQLite3 ODBC Driver};Database=" + dbl_database_path() + ";"
         },
         "libraries": []
     }
@@ -173,7 +1527,7 @@ def generate_kicad_dbl(tables_data):
         fp_col = next((c for c in cols if c.lower() == 'footprint'), None)
 
         if not sym_col or not fp_col:
-            print(f"  [WARNING] Table '{table['table_name']}' missing 'symbol' or 'footprint' column. Skipping JSON entry.")
+            log_warning(f"  [WARNING] Table '{table['table_name']}' missing 'symbol' or 'footprint' column. Skipping JSON entry.")
             continue
 
         # Build Fields List
@@ -218,26 +1572,328 @@ def generate_kicad_dbl(tables_data):
         
         dbl_data['libraries'].append(lib_entry)
 
-    # Write JSON file
+    # Write JSON file (left alone if nothing changed, so KiCad has no reason to reload it)
+    content = json.dumps(dbl_data, indent=4)
     try:
+        if os.path.exists(dbl_file):
+            with open(dbl_file, 'r', encoding='utf-8') as f:
+                if f.read() == content:
+                    log(f"  [UNCHANGED] {os.path.basename(dbl_file)}")
+                    return
         with open(dbl_file, 'w', encoding='utf-8') as f:
-            json.dump(dbl_data, f, indent=4)
-        print(f"  [SUCCESS] Created {dbl_filename}")
+            f.write(content)
+        log(f"  [SUCCESS] Created {os.path.basename(dbl_file)}")
     except Exception as e:
-        print(f"  [ERROR] Failed to write JSON: {e}")
+        log_error(f"  [ERROR] Failed to write JSON: {e}")
 
 # ==========================================
-# MAIN EXECUTION
+# PHASE 3: CHECK SYMBOL / FOOTPRINT REFERENCES
 # ==========================================
 
-if __name__ == "__main__":
-    # Run Phase 1
-    tables_found = update_database()
-    
-    # Run Phase 2 (only if tables were found)
+# Names per library file or folder, reused while its mtime and size are
+# unchanged: {path: ((mtime_ns, size), names)}. A .pretty folder's mtime
+# changes whenever a footprint is added, removed or renamed.
+library_index_cache = {}
+
+def read_symbol_names(path):
+    """Names of the top-level symbols in a .kicad_sym file (units like "R_0_1" are nested deeper)"""
+    return set(kicad_sexpr.node_index(path))
+
+def read_footprint_names(path):
+    """Names of the footprints in a .pretty folder (one .kicad_mod file each)"""
+    return {os.path.splitext(name)[0] for name in os.listdir(path) if name.endswith('.kicad_mod')}
+
+def library_index(path, reader):
+    """The cached set of names in a library, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = library_index_cache.get(path)
+    if cached is None or cached[0] != key:
+        try:
+            names = reader(path)
+        except (OSError, ValueError) as e:
+            log_error(f"  [ERROR] Could not read {path}: {e}")
+            return set()
+        cached = library_index_cache[path] = (key, names)
+    return cached[1]
+
+def stock_library_folder(env_vars):
+    return next((os.environ[var] for var in env_vars if os.path.isdir(os.environ.get(var, ''))), None)
+
+def library_names(kind, nickname):
+    """
+    The names in library `nickname` ('INO_Symbols', 'Device', ...) as a set,
+    None if the library is stock KiCad and the KiCad folders are unknown, or
+    False if it can't be found anywhere.
+    """
+    if kind == 'symbol':
+        local, stock_vars, suffix, reader = symbols_folder, KICAD_SYMBOL_DIR_VARS, '.kicad_sym', read_symbol_names
+    else:
+        local, stock_vars, suffix, reader = footprints_folder, KICAD_FOOTPRINT_DIR_VARS, '.pretty', read_footprint_names
+    names = library_index(os.path.join(local, nickname + suffix), reader)
+    if names is not None:
+        return names
+    stock = stock_library_folder(stock_vars)
+    if stock is None:
+        return None
+    names = library_index(os.path.join(stock, nickname + suffix), reader)
+    return names if names is not None else False
+
+def validate_references(tables_data, strict=False):
+    """
+    Checks every symbol and footprint referenced by the built tables and
+    returns the number of broken references. Each table is read once, grouped
+    by reference (the symbol/footprint indexes make this an index scan), so
+    each distinct reference is looked up only once.
+    """
+    log("-" * 50)
+    log("PHASE 3: Checking symbol and footprint references...")
+    report = log_error if strict else log_warning
+    broken = 0
+    checked = 0
+    unchecked = {}
+    conn = connect_read_only(db_file)
+    try:
+        for table in tables_data:
+            cols = table['columns']
+            key_col = cols[0]
+            for kind in ('symbol', 'footprint'):
+                col = next((c for c in cols if c.lower() == kind), None)
+                if col is None:
+                    continue
+                rows = conn.execute(f"SELECT {col}, COUNT(*), MIN({key_col}) FROM {table['table_name']} GROUP BY {col}")
+                for reference, count, example in rows:
+                    nickname, _, name = (reference or '').partition(':')
+                    if not nickname or not name:
+                        report(f"  [MISSING] {table['table_name']}: {kind} '{reference or ''}' is not a "
+                               f"'Library:Name' reference ({count} parts, e.g. {example})")
+                        broken += 1
+                        continue
+                    names = library_names(kind, nickname)
+                    if names is None:
+                        unchecked[nickname] = unchecked.get(nickname, 0) + count
+                    elif names is False:
+                        report(f"  [MISSING] {table['table_name']}: {kind} library '{nickname}' not found "
+                               f"(for '{reference}', {count} parts, e.g. {example})")
+                        broken += 1
+                    elif name not in names:
+                        report(f"  [MISSING] {table['table_name']}: {kind} '{reference}' not found "
+                               f"({count} parts, e.g. {example})")
+                        broken += 1
+                    else:
+                        checked += count
+    except sqlite3.Error as e:
+        log_error(f"  [SQL ERROR] Could not check references: {e}")
+    finally:
+        conn.close()
+
+    if unchecked:
+        log(f"  [NOT CHECKED] {sum(unchecked.values())} references to stock KiCad libraries "
+            f"({', '.join(sorted(unchecked))}); set {KICAD_SYMBOL_DIR_VARS[0]} / {KICAD_FOOTPRINT_DIR_VARS[0]} to check them.")
+    if not broken:
+        log(f"  [OK] {checked} references resolved.")
+    return broken
+
+# ==========================================
+# WATCH MODE
+# ==========================================
+
+def snapshot_csvs():
+    """Returns {filename: (size, mtime_ns)} for the CSVs in the Database folder"""
+    snapshot = {}
+    try:
+        entries = list(os.scandir(csv_folder))
+    except FileNotFoundError:
+        return snapshot
+    for entry in entries:
+        if entry.name.lower().endswith('.csv'):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue # deleted between listing and stat
+            snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+def run_build(options=None, strict=False):
+    """
+    Runs all phases once and returns the built tables. `options` are passed
+    on to update_database(); `strict` makes broken references errors.
+    """
+    tables_found = update_database(**(options or {}))
     if tables_found:
         generate_kicad_dbl(tables_found)
-    
-    print("-" * 50)
-    print("Done.")
-    input("Press Enter to close...")
\ No newline at end of file
+        if VALIDATE_REFERENCES:
+            with timed('validate'):
+                validate_references(tables_found, strict=strict)
+    return tables_found
+
+def watch_library(interval=None, debounce=None, options=None, strict=False):
+    """
+    Rebuilds the library whenever a CSV in the Database folder changes.
+    `options` and `strict` are passed on to run_build() for every build.
+
+    The folder is polled every `interval` seconds. A change only triggers a
+    build once the folder has been quiet for `debounce` seconds, so a burst of
+    saves from a spreadsheet program results in one build. The manifest makes
+    each build touch only the CSVs that actually changed.
+    """
+    if interval is None:
+        interval = WATCH_INTERVAL
+    if debounce is None:
+        debounce = WATCH_DEBOUNCE
+
+    log(f"Watching {csv_folder} for changes. Press Ctrl+C to stop.")
+    log("-" * 50)
+    last = snapshot_csvs()
+    run_build(options, strict)
+
+    try:
+        while True:
+            time.sleep(interval)
+            current = snapshot_csvs()
+            if current == last:
+                continue
+
+            # Wait for the burst of writes to settle
+            while True:
+                time.sleep(debounce)
+                settled = snapshot_csvs()
+                if settled == current:
+                    break
+                current = settled
+
+            changed = sorted(name for name in set(last) | set(current) if last.get(name) != current.get(name))
+            log("=" * 50)
+            log(f"{time.strftime('%H:%M:%S')} Change detected: {', '.join(changed)}")
+            start = time.perf_counter()
+            try:
+                run_build(options, strict)
+            except (SystemExit, Exception) as e:
+                # e.g. the database could not be swapped in, or the .tmp file
+                # is locked. `last` is left alone, so the next poll still sees
+                # the change and retries.
+                if not isinstance(e, SystemExit):
+                    log_error(f"  [ERROR] Build failed: {type(e).__name__}: {e}")
+                log("  Build failed, retrying.")
+                continue
+            last = current
+            log(f"  Rebuilt in {time.perf_counter() - start:.3f}s")
+    except KeyboardInterrupt:
+        log("\nStopped watching.")
+
+# ==========================================
+# MAIN EXECUTION
+# ==========================================
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Builds the INO component database and KiCad .kicad_dbl from the CSVs in Database/.")
+    parser.add_argument('--root', help="library root folder (default: the folder of this script)")
+    parser.add_argument('--csv-dir', help="folder with the category CSVs (default: <root>/Database)")
+    parser.add_argument('--db', help=f"SQLite database to build (default: <root>/{db_filename})")
+    parser.add_argument('--dbl', help=f"KiCad database library file to write (default: <root>/{dbl_filename})")
+    parser.add_argument('--category', action='append', metavar='NAME',
+                        help="only rebuild this category (CSV file name without .csv); repeatable")
+    parser.add_argument('--workers', type=int, help="CSV parser processes (default: one per CPU core)")
+    parser.add_argument('--layout', choices=['rowid', 'without_rowid'], help="category table layout")
+    # Left at None when not given, so PRUNE_DRY_RUN / PRUNE_ORPHANS apply
+    parser.add_argument('--prune-dry-run', action='store_const', const=True,
+                        help="list orphaned tables without removing them")
+    parser.add_argument('--keep-orphans', dest='prune_orphans', action='store_const', const=False,
+                        help="never remove orphaned tables")
+    parser.add_argument('--strict-references', action='store_true',
+                        help="treat missing symbols/footprints as build errors (exit code 1)")
+    parser.add_argument('--watch', action='store_true', help="keep running and rebuild when a CSV changes")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--quiet', action='store_true', help="only print warnings and errors (to stderr)")
+    output.add_argument('--json', action='store_true', help="print a JSON summary instead of progress messages")
+    parser.add_argument('--profile', action='store_true',
+                        help="print time, rows/s and peak memory per build phase and table")
+    parser.add_argument('--profile-report', metavar='FILE', help="write the build profile to a JSON file")
+    parser.add_argument('--pause', action='store_true', help="wait for Enter before exiting")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    global QUIET
+    if argv is None:
+        argv = sys.argv[1:]
+    args = parse_args(argv)
+    QUIET = args.quiet or args.json
+    configure_paths(args.root, args.csv_dir, args.db, args.dbl)
+    if args.workers is not None and args.workers < 1:
+        log_error("--workers must be at least 1")
+        return EXIT_USAGE
+    if args.watch and args.json:
+        log_error("--json cannot be combined with --watch")
+        return EXIT_USAGE
+    options = {'parse_workers': args.workers, 'table_layout': args.layout, 'categories': args.category,
+               'prune_orphans': args.prune_orphans, 'prune_dry_run': args.prune_dry_run}
+
+    # Double-clicking the script on Windows opens a console that would vanish
+    # immediately, so keep the old "Press Enter" prompt for that case only
+    pause = args.pause or (not argv and os.name == 'nt' and sys.stdin.isatty())
+
+    start = time.perf_counter()
+    exit_code = EXIT_OK
+    tables_found = []
+    try:
+        csv_names = set()
+        if os.path.isdir(csv_folder):
+            csv_names = {os.path.splitext(f)[0] for f in os.listdir(csv_folder) if f.lower().endswith('.csv')}
+        csv_names = {n.lower() for n in csv_names} | {sanitize_sql_name(n).lower() for n in csv_names}
+        unknown = sorted(c for c in args.category or [] if c.lower() not in csv_names)
+
+        if not os.path.isdir(csv_folder):
+            log_error(f"ERROR: Database folder not found: {csv_folder}")
+            exit_code = EXIT_NO_INPUT
+        elif not csv_names:
+            log_error(f"ERROR: No CSV files found in {csv_folder}")
+            exit_code = EXIT_NO_INPUT
+        elif unknown:
+            log_error(f"ERROR: No CSV for category: {', '.join(unknown)}")
+            exit_code = EXIT_USAGE
+        else:
+            for output in (db_file, dbl_file):
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+            if args.watch:
+                watch_library(options=options, strict=args.strict_references)
+                return EXIT_OK
+            # Phase 1, then 2 and 3 if tables were found
+            tables_found = run_build(options, strict=args.strict_references)
+            if build_errors:
+                exit_code = EXIT_BUILD_ERRORS
+    except SystemExit as e:
+        exit_code = e.code
+
+    if args.json:
+        summary = {
+            'exit_code': exit_code,
+            'database': db_file,
+            'dbl': dbl_file,
+            'elapsed_seconds': round(time.perf_counter() - start, 4),
+            'tables': [{key: t[key] for key in ('table_name', 'display_name', 'status', 'rows',
+                                                 'added', 'changed', 'removed') if key in t}
+                       for t in tables_found],
+            'warnings': build_warnings,
+            'errors': build_errors,
+        }
+        if args.profile:
+            summary['profile'] = profile_report()
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        if args.profile and profile_records:
+            print_profile()
+        log("-" * 50)
+        log("Done." if exit_code == EXIT_OK else f"Finished with errors (exit code {exit_code}).")
+    if args.profile_report and profile_records:
+        write_profile_report(args.profile_report)
+
+    if pause:
+        input("Press Enter to close...")
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""
+Helpers shared by the library tools for their cache files (the symbol
+index, footprint catalog, model index and model geometry): content hashes
+and atomic JSON writes.
+"""
+import hashlib
+import json
+import os
+
+CHUNK_SIZE = 1024 * 1024
+
+def hash_file(path):
+    """Returns the SHA-256 hex digest of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def write_json(path, data):
+    """
+    Writes a cache file through <path>.tmp and a rename, so a reader never
+    sees half a file. Returns False if it could not be written (e.g. a
+    read-only library): the caches only save time, so callers carry on.
+    """
+    try:
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,227 @@
+"""
+Cached catalog of a KiCad footprint library (.pretty folder).
+
+For every .kicad_mod it records the pads (number, type, position, size),
+the courtyard bounding box, the layers used and the 3D model paths with
+their (offset / scale / rotate) placement. The
+catalog is kept in <folder>.catalog.json next to the library; on each call
+only footprints whose file changed are parsed again, over a process pool
+when there are many of them.
+
+Usage: python footprint_catalog.py [PRETTY_FOLDER]   (default: Footprints/INO_Footprints.pretty)
+"""
+import concurrent.futures
+import json
+import os
+import re
+import sys
+import time
+
+import file_cache
+import kicad_sexpr
+
+CATALOG_SUFFIX = '.catalog.json'
+CATALOG_VERSION = 2
+
+# Parser processes for changed footprints (None = one per CPU core). Starting
+# a pool costs more than parsing a handful of files, so below
+# PARALLEL_MIN_FILES changed footprints they are parsed in this process.
+PARSE_WORKERS = None
+PARALLEL_MIN_FILES = 64
+
+COURTYARD_LAYERS = {'F.CrtYd', 'B.CrtYd'}
+
+# (model ...) settings kept per model, with KiCad's defaults
+MODEL_PLACEMENT = (('offset', (0.0, 0.0, 0.0)), ('scale', (1.0, 1.0, 1.0)), ('rotate', (0.0, 0.0, 0.0)))
+
+def natural_key(text):
+    """Sort key that puts pad '2' before pad '10'"""
+    return [(0, int(part), '') if part.isdigit() else (1, 0, part) for part in re.split(r'(\d+)', text) if part]
+
+def numbers(node, head):
+    """The numeric arguments of the first `head` child of a parsed node, e.g. (at 1.2 -0.5) -> [1.2, -0.5]"""
+    found = kicad_sexpr.children(node, head)
+    if not found:
+        return None
+    values = []
+    for atom in found[0][1:]:
+        try:
+            values.append(float(atom))
+        except (TypeError, ValueError):
+            break
+    return values
+
+def xyz(model, head, default):
+    """A model's (offset (xyz x y z)) style setting as [x, y, z]"""
+    found = kicad_sexpr.children(model, head)
+    values = numbers(found[0], 'xyz') if found else None
+    return values[:3] if values and len(values) >= 3 else list(default)
+
+def shape_points(item):
+    """Points that bound a graphic item (fp_line, fp_rect, fp_circle, fp_arc, fp_poly)"""
+    kind = item[0]
+    if kind == 'fp_circle':
+        center, end = numbers(item, 'center'), numbers(item, 'end')
+        if center and end:
+            radius = ((end[0] - center[0]) ** 2 + (end[1] - center[1]) ** 2) ** 0.5
+            return [(center[0] - radius, center[1] - radius), (center[0] + radius, center[1] + radius)]
+        return []
+    if kind == 'fp_poly':
+        pts = kicad_sexpr.children(item, 'pts')
+        return [tuple(float(v) for v in xy[1:3]) for xy in kicad_sexpr.children(pts[0], 'xy')] if pts else []
+    points = [numbers(item, head) for head in ('start', 'mid', 'end')]
+    return [tuple(p[:2]) for p in points if p and len(p) >= 2]
+
+def parse_footprint(path):
+    """Reads one .kicad_mod into a catalog entry (without the file stats)"""
+    with open(path, 'rb') as f:
+        node = kicad_sexpr.parse(f.read())
+    if not node or node[0] not in ('footprint', 'module'):
+        raise ValueError("not a footprint file")
+
+    layers = set()
+    pads = []
+    courtyard = []
+    models = []
+    placements = []
+    attr = []
+    for child in node[2:]:
+        if not isinstance(child, list) or not child:
+            continue
+        head = child[0]
+        for layer in kicad_sexpr.children(child, 'layer') + kicad_sexpr.children(child, 'layers'):
+            layers.update(layer[1:])
+        if head == 'layer':
+            layers.update(child[1:])
+        elif head == 'attr':
+            attr = child[1:]
+        elif head == 'pad':
+            at = numbers(child, 'at') or [0.0, 0.0]
+            size = numbers(child, 'size') or [0.0, 0.0]
+            pads.append([child[1], child[2], at[0], at[1], size[0], size[-1]])
+        elif head == 'model':
+            models.append(child[1])
+            placements.append([xyz(child, head, default) for head, default in MODEL_PLACEMENT])
+        elif head.startswith('fp_'):
+            item_layers = kicad_sexpr.children(child, 'layer')
+            if item_layers and item_layers[0][1] in COURTYARD_LAYERS:
+                courtyard.extend(shape_points(child))
+
+    pad_numbers = sorted({pad[0] for pad in pads if pad[0]}, key=natural_key)
+    bbox = None
+    if courtyard:
+        xs = [p[0] for p in courtyard]
+        ys = [p[1] for p in courtyard]
+        bbox = [min(xs), min(ys), max(xs), max(ys)]
+    return {
+        'name': node[1],
+        'attr': attr,
+        'pad_count': len(pad_numbers),
+        'pad_numbers': pad_numbers,
+        'pads': pads,
+        'courtyard': bbox,
+        'layers': sorted(layers),
+        'models': models,
+        'model_placements': placements,
+    }
+
+def parse_footprint_file(path):
+    """parse_footprint() for the pool: errors come back as an entry instead of an exception"""
+    try:
+        return parse_footprint(path)
+    except (OSError, ValueError, IndexError, UnicodeDecodeError) as e:
+        return {'error': str(e)}
+
+def catalog_path(folder):
+    return os.path.normpath(folder) + CATALOG_SUFFIX
+
+def read_catalog(folder):
+    try:
+        with open(catalog_path(folder), 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('version') == CATALOG_VERSION:
+            return saved['footprints']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+def write_catalog(folder, footprints):
+    # A read-only library still gets its catalog for this run
+    file_cache.write_json(catalog_path(folder), {'version': CATALOG_VERSION, 'footprints': footprints})
+
+def library_folders(folder):
+    """{nickname: path} of the .pretty libraries in a folder (Footprints/ of the repo)"""
+    if not os.path.isdir(folder):
+        return {}
+    return {entry.name[:-len('.pretty')]: entry.path
+            for entry in sorted(os.scandir(folder), key=lambda e: e.name)
+            if entry.is_dir() and entry.name.endswith('.pretty')}
+
+def load_catalog(folder, workers=None, stats=None):
+    """
+    Returns {footprint name: entry} for every .kicad_mod in `folder`,
+    reusing cached entries whose file size and mtime (or, failing that,
+    content hash) are unchanged. If `stats` is a dict it receives the
+    number of 'cached' and 'parsed' footprints.
+    """
+    if workers is None:
+        workers = PARSE_WORKERS or os.cpu_count() or 1
+    cached = read_catalog(folder)
+    footprints = {}
+    todo = []
+    for entry in os.scandir(folder):
+        if not entry.name.endswith('.kicad_mod'):
+            continue
+        name = entry.name[:-len('.kicad_mod')]
+        stat = entry.stat()
+        previous = cached.get(name)
+        current = {'file': entry.name, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': None}
+        if previous and previous['size'] == stat.st_size:
+            if previous['mtime_ns'] == stat.st_mtime_ns:
+                footprints[name] = previous
+                continue
+            # Touched but maybe not edited
+            current['sha256'] = file_cache.hash_file(entry.path)
+            if current['sha256'] == previous['sha256']:
+                footprints[name] = dict(previous, mtime_ns=stat.st_mtime_ns)
+                continue
+        todo.append((name, entry.path, current))
+
+    paths = [path for _, path, _ in todo]
+    if workers > 1 and len(todo) >= PARALLEL_MIN_FILES:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(parse_footprint_file, paths, chunksize=max(1, len(paths) // (workers * 4))))
+    else:
+        parsed = [parse_footprint_file(path) for path in paths]
+
+    for (name, path, current), result in zip(todo, parsed):
+        if current['sha256'] is None:
+            current['sha256'] = file_cache.hash_file(path)
+        current.update(result)
+        footprints[name] = current
+
+    if todo or set(cached) != set(footprints):
+        write_catalog(folder, footprints)
+    if stats is not None:
+        stats.update(cached=len(footprints) - len(todo), parsed=len(todo))
+    return footprints
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        print(__doc__.strip())
+        sys.exit(2)
+    folder = sys.argv[1] if len(sys.argv) == 2 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'Footprints', 'INO_Footprints.pretty')
+    start = time.perf_counter()
+    stats = {}
+    catalog = load_catalog(folder, stats=stats)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for name in sorted(catalog, key=str.lower):
+        entry = catalog[name]
+        if 'error' in entry:
+            print(f"{name:<44} ERROR: {entry['error']}")
+            continue
+        box = entry['courtyard']
+        size = f"{box[2] - box[0]:.2f} x {box[3] - box[1]:.2f} mm" if box else "no courtyard"
+        print(f"{name:<44} {entry['pad_count']:>4} pads  {size:<22} {len(entry['models'])} model(s)")
+    print(f"{len(catalog)} footprint(s) in {elapsed_ms:.2f} ms ({stats['parsed']} parsed, {stats['cached']} cached)")
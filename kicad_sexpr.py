@@ -0,0 +1,224 @@
+"""
+Streaming reader for KiCad S-expression files (.kicad_sym, .kicad_mod).
+
+iter_nodes() walks a file in chunks and yields its top-level symbol and
+footprint nodes as Node(kind, name, start, end), where start/end are byte
+offsets into the file. Nothing inside a node is parsed, so even very large
+vendor libraries are scanned in a single pass with flat memory. To look
+inside one node, read its byte range with read_node() and turn it into
+nested lists with parse().
+
+node_index() keeps those byte ranges (plus a hash of each node) in a
+sidecar file next to the library, so load_node() can mmap the library and
+parse one symbol without scanning the file again.
+
+Usage: python kicad_sexpr.py FILE [NAME]   (lists the nodes of a library file, or prints one)
+"""
+import collections
+import hashlib
+import json
+import mmap
+import os
+import re
+import sys
+import time
+
+import file_cache
+
+# Nodes yielded by iter_nodes(): the root itself in a .kicad_mod (the old
+# 'module' keyword included), or the children of the root in a .kicad_sym
+TOP_LEVEL_KINDS = ('symbol', 'footprint', 'module')
+
+CHUNK_SIZE = 1024 * 1024
+
+# Quoted strings are matched whole so parentheses inside them don't count; a
+# lone quote is a string that continues past the end of the buffer
+TOKEN_PATTERN = re.compile(rb'"(?:[^"\\]|\\.)*"|[()]|"')
+HEAD_PATTERN = re.compile(rb'\(\s*([^\s()"]+)(?:\s+("(?:[^"\\]|\\.)*"|[^\s()"]+))?')
+PARSE_PATTERN = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+ESCAPES = {b'n': '\n', b't': '\t', b'r': '\r'}
+
+# Sidecar index written next to a library: <library file>.idx
+INDEX_SUFFIX = '.idx'
+INDEX_VERSION = 1
+
+Node = collections.namedtuple('Node', 'kind name start end')
+
+def unquote(token):
+    """Decodes an atom or a quoted string (with KiCad's backslash escapes) to str"""
+    if token[:1] == b'"':
+        token = token[1:-1]
+    if b'\\' not in token:
+        return token.decode('utf-8')
+    parts = re.split(rb'\\(.)', token, flags=re.S)
+    return ''.join(ESCAPES.get(part, part.decode('utf-8')) if i % 2 else part.decode('utf-8')
+                   for i, part in enumerate(parts))
+
+def iter_nodes(path, kinds=TOP_LEVEL_KINDS, chunk_size=None):
+    """
+    Yields Node(kind, name, start, end) for every top-level node of one of
+    `kinds` in the file, in file order. end is exclusive, so
+    data[start:end] is the node's text including its parentheses.
+    """
+    if chunk_size is None:
+        chunk_size = CHUNK_SIZE
+    kinds = {kind.encode() for kind in kinds}
+    depth = 0
+    offset = 0      # file offset of buffer[0]
+    buffer = b''
+    current = None  # (kind, name, start, depth) of the node being read
+    with open(path, 'rb') as f:
+        eof = False
+        while not eof:
+            data = f.read(chunk_size)
+            eof = not data
+            buffer += data
+            # Scan up to the last newline only. KiCad writes every head like
+            # (symbol "name" on one line, so no token is cut in half.
+            cut = len(buffer) if eof else buffer.rfind(b'\n') + 1
+            for m in TOKEN_PATTERN.finditer(buffer, 0, cut):
+                token = m.group()
+                pos = m.start()
+                if token == b'(':
+                    if current is None and depth <= 1:
+                        head = HEAD_PATTERN.match(buffer, pos, cut)
+                        if head and head.group(1) in kinds:
+                            name = unquote(head.group(2)) if head.group(2) else None
+                            current = (head.group(1).decode(), name, offset + pos, depth)
+                    depth += 1
+                elif token == b')':
+                    depth -= 1
+                    if depth < 0:
+                        raise ValueError(f"{path}: unbalanced ')' at byte {offset + pos}")
+                    if current is not None and depth == current[3]:
+                        yield Node(current[0], current[1], current[2], offset + pos + 1)
+                        current = None
+                elif token == b'"':
+                    if eof:
+                        raise ValueError(f"{path}: unterminated string at byte {offset + pos}")
+                    # Wait for the rest of the string
+                    cut = pos
+                    break
+            buffer = buffer[cut:]
+            offset += cut
+    if depth != 0:
+        raise ValueError(f"{path}: {depth} unclosed '(' at end of file")
+
+def index_path(path):
+    return path + INDEX_SUFFIX
+
+def build_index(path):
+    """{name: (kind, start, end, sha256 of the node's bytes)} for every top-level node in the file"""
+    index = {}
+    with open(path, 'rb') as f:
+        for node in iter_nodes(path):
+            f.seek(node.start)
+            index[node.name] = (node.kind, node.start, node.end,
+                                hashlib.sha256(f.read(node.end - node.start)).hexdigest())
+    return index
+
+def node_index(path, write=True, rebuild=False):
+    """
+    The index of `path`, from its sidecar file if that was made for the
+    library's current mtime and size, otherwise rebuilt (and the sidecar
+    rewritten, unless write is False or the folder is read-only).
+    """
+    stat = os.stat(path)
+    sidecar = index_path(path)
+    if not rebuild:
+        try:
+            with open(sidecar, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if (saved.get('version') == INDEX_VERSION and saved.get('size') == stat.st_size
+                    and saved.get('mtime_ns') == stat.st_mtime_ns):
+                return {name: tuple(entry) for name, entry in saved['nodes'].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass # missing or unreadable: rebuild it
+
+    index = build_index(path)
+    if write:
+        # A read-only folder only means the index isn't kept
+        file_cache.write_json(sidecar, {'version': INDEX_VERSION, 'size': stat.st_size,
+                                        'mtime_ns': stat.st_mtime_ns, 'nodes': index})
+    return index
+
+def load_node(path, name, index=None):
+    """
+    Parses one node of a library by name, reading only its byte range
+    through mmap. Returns None if the library has no such node. A node whose
+    bytes no longer match the indexed hash (the file was rewritten within
+    the same mtime) triggers a rebuild of the index.
+    """
+    if index is None:
+        index = node_index(path)
+    if name not in index:
+        return None
+    kind, start, end, digest = index[name]
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        chunk = data[start:end] if end <= len(data) else b''
+    if hashlib.sha256(chunk).hexdigest() != digest:
+        index = node_index(path, rebuild=True)
+        if name not in index:
+            return None
+        kind, start, end, digest = index[name]
+        chunk = read_node(path, Node(kind, name, start, end))
+    return parse(chunk)
+
+def read_node(path, node):
+    """The bytes of one node, read without touching the rest of the file"""
+    with open(path, 'rb') as f:
+        f.seek(node.start)
+        return f.read(node.end - node.start)
+
+def parse(data):
+    """
+    Parses the text of one node into nested lists of str, e.g.
+    b'(pin input line (number "1"))' -> ['pin', 'input', 'line', ['number', '1']]
+    """
+    stack = [[]]
+    pos = 0
+    end = len(data.rstrip())
+    while pos < end:
+        m = PARSE_PATTERN.match(data, pos)
+        if m is None:
+            raise ValueError(f"unexpected input at byte {pos}")
+        pos = m.end()
+        if m.group(1):
+            stack.append([])
+        elif m.group(2):
+            if len(stack) == 1:
+                raise ValueError(f"unbalanced ')' at byte {m.start(2)}")
+            node = stack.pop()
+            stack[-1].append(node)
+        elif m.group(3) is not None:
+            stack[-1].append(unquote(m.group(3)))
+        else:
+            stack[-1].append(m.group(4).decode('utf-8'))
+    if len(stack) != 1:
+        raise ValueError(f"{len(stack) - 1} unclosed '(' at end of input")
+    return stack[0][0] if len(stack[0]) == 1 else stack[0]
+
+def children(node, head):
+    """The child lists of a parsed node whose first atom is `head`"""
+    return [child for child in node[1:] if isinstance(child, list) and child and child[0] == head]
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print(__doc__.strip())
+        sys.exit(2)
+    if len(sys.argv) == 3:
+        start = time.perf_counter()
+        node = load_node(sys.argv[1], sys.argv[2])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if node is None:
+            print(f"No node named '{sys.argv[2]}' in {sys.argv[1]}")
+            sys.exit(1)
+        print(json.dumps(node, indent=1, ensure_ascii=False))
+        print(f"Loaded in {elapsed_ms:.2f} ms")
+        sys.exit(0)
+    start = time.perf_counter()
+    nodes = list(iter_nodes(sys.argv[1]))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for node in nodes:
+        print(f"{node.kind:<10} {node.name or '':<40} {node.start:>10} {node.end - node.start:>9} bytes")
+    print(f"{len(nodes)} node(s) in {elapsed_ms:.2f} ms")
@@ -0,0 +1,153 @@
+"""
+Finds duplicate 3D models in the 3D_Models folder and optionally merges them.
+
+Every model is hashed (in parallel, cached in 3D_Models.index.json, see
+model_paths.py). Models whose content hash matches are duplicates: exact
+copies under another name, or STEP files with the same geometry that were
+only re-exported (a different header). The report lists each group with
+the footprints that use it and the bytes a merge would save.
+
+With --apply every group is stored once, content-addressed, as
+3D_Models/by_hash/<content hash>.<ext>; the copies are deleted and the
+footprints that used any of them are repointed to
+${INO_LIB}/3D_Models/by_hash/... Models without duplicates keep their name.
+
+Usage: python model_dedup.py [--apply] [--root DIR] [--json]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+
+import model_paths
+
+# Folder below 3D_Models that holds the merged models
+SHARED_FOLDER = 'by_hash'
+
+def find_duplicates(index):
+    """
+    Groups the models of model_index() by content hash. Returns a list of
+    {'digest', 'ext', 'models': [paths below 3D_Models], 'exact', 'bytes_saved'}
+    for every hash shared by more than one model, largest savings first.
+    """
+    by_content = {}
+    for relative, entry in index.items():
+        ext = os.path.splitext(relative)[1].lower()
+        # .step and .stp are the same format; other extensions never merge with them
+        kind = '.step' if ext in ('.step', '.stp') else ext
+        by_content.setdefault((entry['content_sha256'], kind), []).append(relative)
+
+    groups = []
+    for (digest, ext), models in by_content.items():
+        if len(models) < 2:
+            continue
+        models.sort(key=str.lower)
+        sizes = [index[m]['size'] for m in models]
+        groups.append({
+            'digest': digest,
+            'ext': ext,
+            'models': models,
+            'exact': len({index[m]['sha256'] for m in models}) == 1,
+            'bytes_saved': sum(sizes) - max(sizes),
+        })
+    groups.sort(key=lambda g: (-g['bytes_saved'], g['models'][0].lower()))
+    return groups
+
+def shared_path(group):
+    """The content-addressed path below 3D_Models for a duplicate group"""
+    return f"{SHARED_FOLDER}/{group['digest']}{group['ext']}"
+
+def plan_merge(root, variable=model_paths.LIBRARY_VARIABLE):
+    """
+    Returns (groups, users): the duplicate groups, each with its 'target'
+    path set, and the model_paths.plan_rewrites() rows of the footprints that
+    use a duplicate, with 'new' pointing at the merged model.
+    """
+    models_folder = os.path.join(root, model_paths.MODELS_FOLDER_NAME)
+    groups = find_duplicates(model_paths.model_index(models_folder))
+    target_of = {}
+    for group in groups:
+        group['target'] = shared_path(group)
+        for relative in group['models']:
+            target_of[relative] = group['target']
+
+    users = []
+    for row in model_paths.plan_rewrites(root, variable):
+        if row['model'] in target_of:
+            row['new'] = f"{variable}/{model_paths.MODELS_FOLDER_NAME}/{target_of[row['model']]}"
+            row['status'] = 'ok' if row['new'] == row['old'] else 'rewrite'
+            users.append(row)
+    return groups, users
+
+def apply_merge(root, groups, users):
+    """
+    Writes the merged models, repoints the footprints, then deletes the
+    copies (in that order, so an interrupted run never leaves a footprint
+    without its model). Returns (models removed, footprint paths changed).
+    """
+    models_folder = os.path.join(root, model_paths.MODELS_FOLDER_NAME)
+    for group in groups:
+        target = os.path.join(models_folder, *group['target'].split('/'))
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(os.path.join(models_folder, *group['models'][0].split('/')), target + '.tmp')
+            os.replace(target + '.tmp', target)
+
+    changed = model_paths.apply_rewrites(users)
+
+    removed = 0
+    for group in groups:
+        for relative in group['models']:
+            if relative == group['target']:
+                continue
+            os.remove(os.path.join(models_folder, *relative.split('/')))
+            removed += 1
+            # Drop category folders the merge left empty
+            folder = os.path.dirname(os.path.join(models_folder, *relative.split('/')))
+            while folder != models_folder and not os.listdir(folder):
+                os.rmdir(folder)
+                folder = os.path.dirname(folder)
+    return removed, changed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reports duplicate 3D models and merges them into a content-addressed folder.")
+    parser.add_argument('--root', default=os.path.dirname(os.path.abspath(__file__)),
+                        help="library root folder (default: the folder of this script)")
+    parser.add_argument('--variable', default=model_paths.LIBRARY_VARIABLE,
+                        help=f"path variable to write (default: {model_paths.LIBRARY_VARIABLE})")
+    parser.add_argument('--apply', action='store_true', help="merge the duplicates and repoint the footprints (default: only report)")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    groups, users = plan_merge(args.root, args.variable)
+    total_saved = sum(group['bytes_saved'] for group in groups)
+
+    if args.json:
+        print(json.dumps({'bytes_saved': total_saved, 'duplicates': groups, 'footprints': users},
+                         indent=2, ensure_ascii=False))
+    else:
+        for group in groups:
+            kind = 'identical' if group['exact'] else 'same geometry'
+            print(f"  [DUPLICATE] {len(group['models'])} models, {kind}, "
+                  f"{group['bytes_saved'] / 1024:.0f} KB saved -> {group['target']}")
+            for relative in group['models']:
+                used_by = sorted({row['footprint'] for row in users if row['model'] == relative}, key=str.lower)
+                print(f"      {relative}" + (f"  (used by {', '.join(used_by)})" if used_by else ""))
+        print("-" * 50)
+        if groups:
+            print(f"{len(groups)} duplicate group(s), {sum(len(g['models']) - 1 for g in groups)} redundant file(s), "
+                  f"{total_saved / 1024:.0f} KB.")
+        else:
+            print("No duplicate models.")
+
+    if args.apply and groups:
+        removed, changed = apply_merge(args.root, groups, users)
+        if not args.json:
+            print(f"Removed {removed} model file(s), repointed {changed} footprint model path(s).")
+    elif groups and not args.json:
+        print("Dry run: run again with --apply to merge them.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
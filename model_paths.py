@@ -0,0 +1,302 @@
+"""
+Checks and rewrites the 3D model paths of the footprint libraries.
+
+Every (model ...) in Footprints/*.pretty is resolved against the 3D_Models
+folder of the library and, where found, rewritten to the portable form
+${INO_LIB}/3D_Models/<path>, so the footprints show their models on any
+machine that defines INO_LIB (KiCad: Preferences > Configure Paths). A reference is resolved, in order, by
+
+  1. its path below 3D_Models (any prefix: C:/INO_Master_Library/..., ${INO_LIB}/...),
+  2. content: if the referenced file exists on this machine, its hash is
+     looked up in the model index (finds renamed copies),
+  3. its file name, if exactly one model in the library has that name,
+  4. a similar name (a unique model whose name ends with the referenced one;
+     not for stock KiCad models, nor names shorter than 6 characters).
+
+Stock KiCad models (${KICAD9_3DMODEL_DIR}, ...) that are not in 3D_Models
+are left alone. The hashes of the models are cached in 3D_Models.index.json
+and only recomputed for files that changed.
+
+Without --apply nothing is written; the report shows what would change.
+Exits with 1 if any reference could not be resolved.
+
+Usage: python model_paths.py [--apply] [--root DIR] [--json]
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+import sys
+
+import file_cache
+import footprint_catalog
+import kicad_sexpr
+
+LIBRARY_VARIABLE = '${INO_LIB}'
+MODELS_FOLDER_NAME = '3D_Models'
+FOOTPRINTS_FOLDER_NAME = 'Footprints'
+MODEL_EXTENSIONS = ('.step', '.stp', '.wrl', '.wrz')
+INDEX_SUFFIX = '.index.json'
+INDEX_VERSION = 2
+
+# Threads for hashing models and rewriting footprints (None = one per CPU
+# core); hashlib and file I/O release the GIL
+WORKERS = None
+
+# Shortest file name (without extension) that resolve() matches by suffix
+SIMILAR_MIN_STEM = 6
+
+# References starting with these are stock KiCad models, portable as they are
+STOCK_VARIABLE_PATTERN = re.compile(r'^\$\{KICAD\d*_3DMODEL_DIR\}')
+VARIABLE_PATTERN = re.compile(r'\$\{([^}]+)\}')
+MODEL_TOKEN_PATTERN = re.compile(rb'(\(model\s+)("(?:[^"\\]|\\.)*"|[^\s()"]+)')
+# Where the geometry of a STEP file starts, after the header with its file
+# name, timestamp and author
+STEP_DATA_PATTERN = re.compile(rb'ENDSEC\s*;\s*DATA\s*;')
+
+def hash_model(path):
+    """
+    Returns (sha256 of the file, sha256 of its content). The content hash of
+    a STEP file covers only its DATA section with line endings ignored, so
+    copies that were re-exported or renamed (same geometry, new header)
+    hash alike; for other formats it is the file hash.
+    """
+    full = hashlib.sha256()
+    data = None
+    pending = b''
+    is_step = path.lower().endswith(('.step', '.stp'))
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            full.update(block)
+            if not is_step:
+                continue
+            block = block.replace(b'\r', b'')
+            if data is not None:
+                data.update(block)
+                continue
+            pending += block
+            m = STEP_DATA_PATTERN.search(pending)
+            if m:
+                data = hashlib.sha256(pending[m.start():])
+            else:
+                pending = pending[-64:]
+    return full.hexdigest(), (data or full).hexdigest()
+
+def index_path(models_folder):
+    return os.path.normpath(models_folder) + INDEX_SUFFIX
+
+def model_index(models_folder, workers=None):
+    """
+    {path below models_folder (with /): {'size', 'mtime_ns', 'sha256',
+    'content_sha256'}} for every model file (see hash_model()), reusing the
+    cached hashes of unchanged files.
+    """
+    if workers is None:
+        workers = WORKERS or os.cpu_count() or 1
+    try:
+        with open(index_path(models_folder), 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        cached = saved['models'] if saved.get('version') == INDEX_VERSION else {}
+    except (OSError, ValueError, KeyError):
+        cached = {}
+
+    index = {}
+    todo = []
+    for folder, _, files in os.walk(models_folder):
+        for filename in files:
+            if not filename.lower().endswith(MODEL_EXTENSIONS):
+                continue
+            path = os.path.join(folder, filename)
+            relative = os.path.relpath(path, models_folder).replace('\\', '/')
+            stat = os.stat(path)
+            entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': None, 'content_sha256': None}
+            previous = cached.get(relative)
+            if previous and previous['size'] == entry['size'] and previous['mtime_ns'] == entry['mtime_ns']:
+                index[relative] = previous
+            else:
+                index[relative] = entry
+                todo.append((relative, path))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for (relative, _), digests in zip(todo, executor.map(hash_model, [p for _, p in todo])):
+            index[relative]['sha256'], index[relative]['content_sha256'] = digests
+
+    if todo or set(cached) != set(index):
+        file_cache.write_json(index_path(models_folder), {'version': INDEX_VERSION, 'models': index})
+    return index
+
+def expand_variables(reference):
+    """The reference with ${VAR} replaced from the environment, or None if a variable is unset"""
+    missing = False
+    def lookup(m):
+        nonlocal missing
+        if m.group(1) not in os.environ:
+            missing = True
+            return m.group(0)
+        return os.environ[m.group(1)]
+    expanded = VARIABLE_PATTERN.sub(lookup, reference)
+    return None if missing else expanded
+
+def index_lookup(index):
+    """
+    The maps resolve() searches, built once per model_index() result: models
+    by lowercase path, by lowercase file name, by content hash, and by every
+    suffix of at least SIMILAR_MIN_STEM characters of their lowercase stem.
+    """
+    lookup = {'paths': {}, 'names': {}, 'digests': {}, 'suffixes': {}}
+    for relative in sorted(index):
+        name = relative.rsplit('/', 1)[-1].lower()
+        stem = os.path.splitext(name)[0]
+        lookup['paths'][relative.lower()] = relative
+        lookup['names'].setdefault(name, []).append(relative)
+        lookup['digests'].setdefault(index[relative]['sha256'], []).append(relative)
+        for start in range(len(stem) - SIMILAR_MIN_STEM + 1):
+            lookup['suffixes'].setdefault(stem[start:], set()).add(relative)
+    return lookup
+
+def resolve(reference, index, models_folder, lookup=None):
+    """
+    Returns (path below 3D_Models or None, how it was found). Pass the
+    index_lookup() of `index` when resolving many references.
+    """
+    if lookup is None:
+        lookup = index_lookup(index)
+    parts = [p for p in re.split(r'[\\/]+', reference) if p]
+
+    # 1. Path below 3D_Models, whatever the prefix
+    for start in range(len(parts)):
+        found = lookup['paths'].get('/'.join(parts[start:]).lower())
+        if found:
+            return found, 'name' if start == len(parts) - 1 else 'path'
+
+    # 2. Same content as a file this machine can see
+    expanded = expand_variables(reference)
+    if expanded and os.path.isfile(expanded) and not os.path.abspath(expanded).startswith(os.path.abspath(models_folder)):
+        matches = lookup['digests'].get(file_cache.hash_file(expanded))
+        if matches:
+            return matches[0], 'content'
+
+    if not parts:
+        return None, 'empty'
+    name = parts[-1].lower()
+    # 3. Unique file name
+    matches = lookup['names'].get(name, [])
+    if len(matches) == 1:
+        return matches[0], 'name'
+    if len(matches) > 1:
+        return None, 'ambiguous'
+    # 4. Unique similar name (IC_TPS65185RGZR.step for TPS65185RGZR.step).
+    # Never for stock models, which are fine as they are, and only for stems
+    # long enough that a suffix match means something.
+    stem = os.path.splitext(name)[0]
+    if STOCK_VARIABLE_PATTERN.match(reference) or len(stem) < SIMILAR_MIN_STEM:
+        return None, 'not found'
+    matches = lookup['suffixes'].get(stem, ())
+    if len(matches) == 1:
+        return next(iter(matches)), 'similar'
+    return None, 'ambiguous' if matches else 'not found'
+
+def plan_rewrites(root, variable=LIBRARY_VARIABLE):
+    """
+    Resolves every model reference of every footprint library (the same
+    Footprints/*.pretty set the builder reads). Returns a list of dicts:
+    {'footprint', 'library', 'file', 'old', 'new', 'model', 'status', 'how'}
+    where model is the path below 3D_Models it resolved to and status is
+    'ok' (already portable and found), 'rewrite', 'stock' or 'unresolved'.
+    """
+    models_folder = os.path.join(root, MODELS_FOLDER_NAME)
+    index = model_index(models_folder)
+    lookup = index_lookup(index)
+
+    plan = []
+    for nickname, library in footprint_catalog.library_folders(os.path.join(root, FOOTPRINTS_FOLDER_NAME)).items():
+        catalog = footprint_catalog.load_catalog(library)
+        for name in sorted(catalog, key=str.lower):
+            entry = catalog[name]
+            for reference in entry.get('models', []):
+                found, how = resolve(reference, index, models_folder, lookup)
+                row = {'footprint': name, 'library': nickname, 'file': os.path.join(library, entry['file']),
+                       'old': reference, 'new': None, 'model': found, 'how': how}
+                if found:
+                    row['new'] = f"{variable}/{MODELS_FOLDER_NAME}/{found}"
+                    row['status'] = 'ok' if row['new'] == reference else 'rewrite'
+                elif STOCK_VARIABLE_PATTERN.match(reference):
+                    row['status'] = 'stock'
+                else:
+                    row['status'] = 'unresolved'
+                plan.append(row)
+    return plan
+
+def quote(text):
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def rewrite_file(path, replacements):
+    """Replaces the (model ...) paths of one footprint file {old: new}; returns the number replaced"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    count = 0
+    def replace(m):
+        nonlocal count
+        old = kicad_sexpr.unquote(m.group(2))
+        if old not in replacements:
+            return m.group(0)
+        count += 1
+        return m.group(1) + quote(replacements[old]).encode('utf-8')
+    data = MODEL_TOKEN_PATTERN.sub(replace, data)
+    if count:
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+    return count
+
+def apply_rewrites(plan, workers=None):
+    """Writes the planned rewrites, one task per footprint file; returns the number of paths changed"""
+    if workers is None:
+        workers = WORKERS or os.cpu_count() or 1
+    by_file = {}
+    for row in plan:
+        if row['status'] == 'rewrite':
+            by_file.setdefault(row['file'], {})[row['old']] = row['new']
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(rewrite_file, by_file, by_file.values()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resolves footprint 3D model paths and rewrites them to ${INO_LIB}.")
+    parser.add_argument('--root', default=os.path.dirname(os.path.abspath(__file__)),
+                        help="library root folder (default: the folder of this script)")
+    parser.add_argument('--variable', default=LIBRARY_VARIABLE, help=f"path variable to write (default: {LIBRARY_VARIABLE})")
+    parser.add_argument('--apply', action='store_true', help="rewrite the footprint files (default: only report)")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    plan = plan_rewrites(args.root, args.variable)
+    counts = {status: sum(1 for row in plan if row['status'] == status)
+              for status in ('ok', 'rewrite', 'stock', 'unresolved')}
+
+    if args.json:
+        print(json.dumps({'counts': counts, 'models': plan}, indent=2, ensure_ascii=False))
+    else:
+        labels = {'ok': '[OK]', 'rewrite': '[REWRITE]', 'stock': '[STOCK]', 'unresolved': '[UNRESOLVED]'}
+        for row in plan:
+            line = f"  {labels[row['status']]:<13} {row['footprint']:<28} {row['old']}"
+            if row['status'] == 'rewrite':
+                line += f"\n  {'':<13} {'':<28} -> {row['new']} (by {row['how']})"
+            elif row['status'] == 'unresolved':
+                line += f" ({row['how']})"
+            print(line)
+        print("-" * 50)
+        print(f"{counts['ok']} ok, {counts['rewrite']} to rewrite, {counts['stock']} stock KiCad, "
+              f"{counts['unresolved']} unresolved.")
+
+    if args.apply:
+        changed = apply_rewrites(plan)
+        if not args.json:
+            print(f"Rewrote {changed} model path(s).")
+    elif counts['rewrite'] and not args.json:
+        print("Dry run: run again with --apply to rewrite the footprints.")
+    return 1 if counts['unresolved'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
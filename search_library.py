@@ -0,0 +1,41 @@
+"""
+Searches the component database generated by build_kicad_library.py.
+
+Every word must match the start of a word in the description, MPN,
+manufacturer, value or package of a part. Results are ranked best first.
+
+Usage: python search_library.py 22n 0402
+"""
+import os
+import sqlite3
+import sys
+import time
+
+import build_kicad_library as builder
+
+RESULT_LIMIT = 25
+
+if __name__ == "__main__":
+    query = " ".join(sys.argv[1:])
+    if not query:
+        print(__doc__.strip())
+        sys.exit(2)
+
+    start = time.perf_counter()
+    try:
+        hits = builder.search_parts(query, limit=RESULT_LIMIT)
+    except sqlite3.OperationalError as e:
+        # No database yet, or one built without the search index
+        if not builder.fts5_available():
+            print("[ERROR] This Python's SQLite has no FTS5, so the library cannot be searched.", file=sys.stderr)
+        elif not os.path.exists(builder.db_file):
+            print(f"[ERROR] {builder.db_file} not found: run build_kicad_library.py first.", file=sys.stderr)
+        else:
+            print(f"[ERROR] Could not search {os.path.basename(builder.db_file)} ({e}): "
+                  "run build_kicad_library.py first.", file=sys.stderr)
+        sys.exit(1)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    for hit in hits:
+        print(f"{hit['table_name']:<16} {hit['part_id']:<10} {hit['value']:<14} {hit['mpn']:<24} {hit['description']}")
+    print(f"{len(hits)} result(s) in {elapsed_ms:.2f} ms")
@@ -0,0 +1,206 @@
+"""
+Bounding boxes of STEP 3D models, read in one streaming pass.
+
+read_step_bbox() scans a .step/.stp file in chunks and takes the extent of
+the model's vertices and circles (CARTESIAN_POINTs and the few entities
+that refer to them), converted to millimetres, without building any
+geometry. The box is the model's own (unplaced) extent; placed_bbox()
+applies a footprint's (offset / scale / rotate) to it the way KiCad's 3D
+viewer does. model_bboxes() caches the results by file hash in a JSON file,
+so each model is only read again after it changes.
+
+Usage: python step_geometry.py FILE [FILE ...]
+"""
+import concurrent.futures
+import json
+import math
+import os
+import re
+import sys
+import time
+
+import file_cache
+
+CHUNK_SIZE = 1024 * 1024
+
+# Cache written next to the models folder: <folder>.geometry.json
+CACHE_SUFFIX = '.geometry.json'
+CACHE_VERSION = 1
+
+# Parser processes for uncached models (None = one per CPU core); a few small
+# models are read faster in this process than by starting a pool
+PARSE_WORKERS = None
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+# The simple entities read for the box: #id = KIND ( 'name', args ) ;
+ENTITY_PATTERN = re.compile(rb"#(\d+)\s*=\s*(CARTESIAN_POINT|DIRECTION|VERTEX_POINT|AXIS2_PLACEMENT_3D|CIRCLE)"
+                            rb"\s*\(\s*'(?:[^']|'')*'\s*,([^;]*)\)\s*;")
+REFERENCE_PATTERN = re.compile(rb'#(\d+)')
+SI_LENGTH_PATTERN = re.compile(rb"SI_UNIT\s*\(\s*(?:\.(\w+)\.|\$)\s*,\s*\.METRE\.\s*\)")
+INCH_PATTERN = re.compile(rb"CONVERSION_BASED_UNIT\s*\(\s*'INCH'")
+SI_PREFIX_MM = {None: 1000.0, b'KILO': 1e6, b'CENTI': 10.0, b'DECI': 100.0, b'MILLI': 1.0, b'MICRO': 1e-3}
+
+def read_step_bbox(path):
+    """
+    Returns {'min': [x, y, z], 'max': [x, y, z], 'points': n} in millimetres,
+    or None if the file has no 3D points.
+
+    The box spans the model's vertices, widened by the full extent of its
+    circles (a cylinder has one vertex on its seam). Other points in a STEP
+    file - axis placements, spline control points - can lie well outside the
+    body, so they only count when the file has no vertices at all.
+    """
+    points = {}       # id: (x, y, z) of every 3D CARTESIAN_POINT
+    directions = {}   # id: (x, y, z)
+    placements = {}   # id: (location id, axis id)
+    vertices = []     # point ids
+    circles = []      # (placement id, radius)
+    scale = None
+    buffer = b''
+    with open(path, 'rb') as f:
+        eof = False
+        while not eof:
+            data = f.read(CHUNK_SIZE)
+            eof = not data
+            buffer += data
+            # Entities end with ';' (which never appears inside the ones read
+            # here), so scanning up to the last one never cuts one in half
+            cut = len(buffer) if eof else buffer.rfind(b';') + 1
+            for m in ENTITY_PATTERN.finditer(buffer, 0, cut):
+                kind, args = m.group(2), m.group(3)
+                if kind == b'CARTESIAN_POINT' or kind == b'DIRECTION':
+                    coords = args.strip(b' \t\r\n()').split(b',')
+                    if len(coords) != 3:
+                        continue # 2D points of parameter-space curves
+                    target = points if kind == b'CARTESIAN_POINT' else directions
+                    target[m.group(1)] = (float(coords[0]), float(coords[1]), float(coords[2]))
+                elif kind == b'VERTEX_POINT':
+                    vertices.append(args.strip().lstrip(b'#'))
+                elif kind == b'AXIS2_PLACEMENT_3D':
+                    refs = REFERENCE_PATTERN.findall(args)
+                    if len(refs) >= 2:
+                        placements[m.group(1)] = (refs[0], refs[1])
+                else: # CIRCLE
+                    ref, _, radius = args.partition(b',')
+                    circles.append((ref.strip().lstrip(b'#'), float(radius)))
+            if scale is None:
+                if INCH_PATTERN.search(buffer, 0, cut):
+                    scale = 25.4
+                else:
+                    unit = SI_LENGTH_PATTERN.search(buffer, 0, cut)
+                    if unit:
+                        scale = SI_PREFIX_MM.get(unit.group(1), 1.0)
+            buffer = buffer[cut:]
+
+    # Each circle reaches radius * sqrt(1 - n_i^2) from its centre along
+    # axis i, where n is the unit normal of its plane
+    boxes = [(points[v], points[v]) for v in vertices if v in points]
+    for ref, radius in circles:
+        placement = placements.get(ref)
+        if placement is None or placement[0] not in points:
+            continue
+        centre = points[placement[0]]
+        normal = directions.get(placement[1], (0.0, 0.0, 0.0))
+        length = math.sqrt(sum(n * n for n in normal)) or 1.0
+        reach = [radius * math.sqrt(max(0.0, 1 - (n / length) ** 2)) for n in normal]
+        boxes.append(([c - r for c, r in zip(centre, reach)], [c + r for c, r in zip(centre, reach)]))
+    if not boxes:
+        boxes = [(p, p) for p in points.values()]
+    if not boxes:
+        return None
+    scale = scale or 1.0
+    return {'min': [min(low[axis] for low, _ in boxes) * scale for axis in range(3)],
+            'max': [max(high[axis] for _, high in boxes) * scale for axis in range(3)],
+            'points': len(boxes)}
+
+def read_step_bbox_safe(path):
+    """read_step_bbox() for the pool: unreadable files give None"""
+    try:
+        return read_step_bbox(path)
+    except (OSError, ValueError):
+        return None
+
+def placed_bbox(bbox, offset=(0, 0, 0), scale=(1, 1, 1), rotate=(0, 0, 0)):
+    """
+    The box of a model as placed by a footprint's (model ...) settings:
+    scaled, rotated by -rotate about X, then Y, then Z (the footprint file
+    stores the angles negated), then moved by offset. Returns (min, max).
+    """
+    corners = [[(bbox['max'] if (i >> axis) & 1 else bbox['min'])[axis] * scale[axis] for axis in range(3)]
+               for i in range(8)]
+    for axis, angle in ((0, rotate[0]), (1, rotate[1]), (2, rotate[2])):
+        if not angle:
+            continue
+        c, s = math.cos(math.radians(-angle)), math.sin(math.radians(-angle))
+        a, b = [(1, 2), (2, 0), (0, 1)][axis]
+        for p in corners:
+            p[a], p[b] = p[a] * c - p[b] * s, p[a] * s + p[b] * c
+    low = [min(p[axis] for p in corners) + offset[axis] for axis in range(3)]
+    high = [max(p[axis] for p in corners) + offset[axis] for axis in range(3)]
+    return low, high
+
+def cache_path(models_folder):
+    return os.path.normpath(models_folder) + CACHE_SUFFIX
+
+def model_bboxes(paths, cache_file, workers=None):
+    """
+    Returns {path: bbox or None} for the given model files. Files are
+    identified by content hash; hashes are reused while a file's size and
+    mtime are unchanged, and only models with an unknown hash are read.
+    """
+    if workers is None:
+        workers = PARSE_WORKERS or os.cpu_count() or 1
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('version') != CACHE_VERSION:
+            raise ValueError
+    except (OSError, ValueError):
+        cache = {'version': CACHE_VERSION, 'files': {}, 'bboxes': {}}
+    files, bboxes = cache['files'], cache['bboxes']
+    changed = False
+
+    digests = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        known = files.get(path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            digests[path] = known[2]
+        else:
+            digests[path] = file_cache.hash_file(path)
+            files[path] = [stat.st_size, stat.st_mtime_ns, digests[path]]
+            changed = True
+
+    todo = sorted({digest: path for path, digest in digests.items() if digest not in bboxes}.items())
+    if todo:
+        todo_paths = [path for _, path in todo]
+        if workers > 1 and len(todo) > 1 and sum(os.path.getsize(p) for p in todo_paths) >= PARALLEL_MIN_BYTES:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(todo))) as executor:
+                results = list(executor.map(read_step_bbox_safe, todo_paths))
+        else:
+            results = [read_step_bbox_safe(path) for path in todo_paths]
+        for (digest, _), bbox in zip(todo, results):
+            bboxes[digest] = bbox
+        changed = True
+
+    if changed:
+        file_cache.write_json(cache_file, cache)
+    return {path: bboxes.get(digest) for path, digest in digests.items()}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__.strip())
+        sys.exit(2)
+    for path in sys.argv[1:]:
+        start = time.perf_counter()
+        bbox = read_step_bbox(path)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if bbox is None:
+            print(f"{path}: no 3D points")
+            continue
+        size = [high - low for low, high in zip(bbox['min'], bbox['max'])]
+        print(f"{path}: {size[0]:.3f} x {size[1]:.3f} x {size[2]:.3f} mm, "
+              f"z {bbox['min'][2]:.3f}..{bbox['max'][2]:.3f} ({bbox['points']} points, {elapsed_ms:.1f} ms)")